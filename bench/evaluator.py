@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+import json
+import os
+import random
+import sys
+import time
+
+
+MYDIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(MYDIR, '..', 'code', 'lightning', 'src'))
+
+import player as punter
+import scorer as scoring
+
+from evaluator import BatchEvaluator
+
+
+def random_board(game_map, players, fill):
+    board = punter.PunterBoard(game_map)
+    rivers = list(range(game_map.river_count))
+    random.shuffle(rivers)
+    for turn, river in enumerate(rivers[:int(len(rivers) * fill)]):
+        board.claim(river, turn % players)
+    return board
+
+
+def run(fn, players, fill, repeat, rescore_limit):
+    with open(fn, 'r') as fd:
+        game_map = punter.PunterMap.from_protocol(json.load(fd))
+
+    distances = punter.DistanceTable.build(game_map)
+    board = random_board(game_map, players, fill)
+    candidates = board.free_rivers()
+
+    evaluator = BatchEvaluator(game_map, distances)
+    scorer = scoring.Scorer.from_board(board, distances, players)
+
+    t = time.perf_counter()
+    for _ in range(repeat):
+        batch = evaluator.evaluate(board, 0, candidates)
+    batch_time = (time.perf_counter() - t) / repeat
+
+    t = time.perf_counter()
+    for _ in range(repeat):
+        loop = [scorer.delta(0, river) for river in candidates]
+    loop_time = (time.perf_counter() - t) / repeat
+
+    sample = candidates[:rescore_limit]
+    base = scorer.score(0)
+    t = time.perf_counter()
+    for river in sample:
+        board.claim(river, 0)
+        scoring.Scorer.from_board(board, distances, players).score(0) - base
+        board.claim(river, board.FREE)
+    rescore_time = (time.perf_counter() - t) / max(1, len(sample)) * len(candidates)
+
+    assert list(batch) == loop
+
+    print('{}: {} sites, {} rivers, {} mines, {} candidates'.format(os.path.basename(fn),
+        game_map.site_count, game_map.river_count, len(game_map.mines), len(candidates)))
+    print('{:<10} {:>12} {:>16}'.format('method', 'ms/call', 'us/candidate'))
+    for name, elapsed in (('batch', batch_time), ('loop', loop_time), ('rescore', rescore_time)):
+        print('{:<10} {:>12.3f} {:>16.3f}'.format(name, elapsed * 1000, elapsed / len(candidates) * 1e6))
+
+
+if __name__ == '__main__':
+    import argparse
+
+    default_map = os.path.join(MYDIR, '..', 'server', 'maps', 'gothenburg-sparse.json')
+
+    parser = argparse.ArgumentParser(description='Batch move evaluator vs per-candidate loop')
+
+    parser.add_argument('map', nargs='?', default=default_map,
+        help='map file, gothenburg-sparse.json')
+
+    parser.add_argument('-n', '--players', type=int, default=4,
+        help='number of players')
+
+    parser.add_argument('-f', '--fill', type=float, default=0.5,
+        help='fraction of rivers claimed')
+
+    parser.add_argument('-r', '--repeat', type=int, default=5,
+        help='repetitions')
+
+    parser.add_argument('--rescore-limit', type=int, default=50,
+        help='candidates timed with full rescoring, extrapolated')
+
+    parser.add_argument('--seed', type=int, default=2017,
+        help='random seed')
+
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    run(args.map, args.players, args.fill, args.repeat, args.rescore_limit)
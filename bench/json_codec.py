@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+import json
+import os
+import sys
+import time
+
+from glob import glob
+
+
+MYDIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(MYDIR, '..', 'code'))
+
+import online
+
+
+def best_of(fn, repeat):
+    res = None
+    for _ in range(repeat):
+        t = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - t
+        res = elapsed if res is None else min(res, elapsed)
+    return res
+
+
+def bench_map(fn, repeat):
+    with open(fn, 'r') as fd:
+        mapobj = json.load(fd)
+
+    message = {'punter': 0, 'punters': 2, 'map': mapobj}
+    data = online.JsonCodec().dumps(message)
+
+    rows = []
+    for name in sorted(online.JSON_CODECS):
+        codec = online.json_codec(name)
+        obj = codec.loads(data)
+
+        parse = best_of(lambda: codec.loads(data), repeat)
+        serialize = best_of(lambda: codec.dumps(obj), repeat)
+
+        rows.append({
+            'map': os.path.basename(fn),
+            'codec': name,
+            'bytes': len(data),
+            'parse_ms': round(parse * 1000, 3),
+            'serialize_ms': round(serialize * 1000, 3),
+        })
+    return rows
+
+
+def run(maps, repeat, as_json=False):
+    if not as_json:
+        print('{:<28} {:<13} {:>8} {:>10} {:>13}'.format('map', 'codec', 'bytes', 'parse ms', 'serialize ms'))
+
+    for fn in maps:
+        for row in bench_map(fn, repeat):
+            if as_json:
+                print(json.dumps(row))
+            else:
+                print('{map:<28} {codec:<13} {bytes:>8} {parse_ms:>10} {serialize_ms:>13}'.format(**row))
+
+
+if __name__ == '__main__':
+    import argparse
+
+    default_maps = os.path.join(MYDIR, '..', 'server', 'maps')
+
+    parser = argparse.ArgumentParser(description='Protocol JSON parse/serialize benchmark')
+
+    parser.add_argument('maps', nargs='*',
+        help='map files, all of server/maps by default')
+
+    parser.add_argument('-r', '--repeat', type=int, default=5,
+        help='repetitions, best time reported')
+
+    parser.add_argument('--json', action='store_true',
+        help='print JSON lines')
+
+    args = parser.parse_args()
+
+    maps = args.maps or sorted(x for x in glob(os.path.join(default_maps, '*.json'))
+        if os.path.basename(x) != 'maps.json')
+
+    run(maps, repeat=args.repeat, as_json=args.json)
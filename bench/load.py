@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+import asyncio
+import os
+import subprocess
+import sys
+import time
+
+
+MYDIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(MYDIR, '..', 'code'))
+
+import async_online
+
+
+def start_servers(server_dir, game_map, ports, seats, logdir=None):
+    procs = list()
+    for port in ports:
+        log = open(os.path.join(logdir, 'server-%d.log' % port), 'w') if logdir else subprocess.DEVNULL
+        procs.append(subprocess.Popen(['node', 'puntd.js', '-b', '127.0.0.1', '-p', str(port),
+            '-w', str(port + 1000), '-m', game_map, '-n', str(seats)],
+            cwd=server_dir, stdout=log, stderr=subprocess.STDOUT))
+    return procs
+
+
+def stop_servers(procs):
+    for proc in procs:
+        proc.terminate()
+    for proc in procs:
+        proc.wait()
+
+
+async def load(client, ports, seats, rounds, concurrency, on_result=None):
+    games = len(ports) * seats * rounds
+    return await async_online.run_games(client, [x for x in ports for _ in range(seats)],
+        games, concurrency, on_result)
+
+
+if __name__ == '__main__':
+    import argparse
+    import json
+
+    default_server = os.path.join(MYDIR, '..', 'server')
+    default_cmd = '%s -u %s' % (sys.executable, os.path.join(MYDIR, '..', 'code', 'lightning', 'src', 'player.py'))
+
+    parser = argparse.ArgumentParser(description='Load test: async clients fill every seat on local node servers')
+
+    parser.add_argument('-m', '--map', type=str, default='maps/lambda.json',
+        help='map file, relative to the server directory')
+
+    parser.add_argument('-k', '--servers', type=int, default=4,
+        help='node server instances')
+
+    parser.add_argument('-n', '--seats', type=int, default=2,
+        help='punters per game')
+
+    parser.add_argument('-r', '--rounds', type=int, default=1,
+        help='games per server')
+
+    parser.add_argument('-c', '--concurrency', type=int,
+        help='client games in flight, every seat of every server by default')
+
+    parser.add_argument('-p', '--port', type=int, default=9300,
+        help='first server port')
+
+    parser.add_argument('--server-dir', type=str, default=default_server,
+        help='node server directory with node_modules installed')
+
+    parser.add_argument('--cmd', type=str, default=default_cmd,
+        help='offline client command line')
+
+    parser.add_argument('--player', type=str, metavar='MODULE:CLASS',
+        help='run a Python PunterPlayer in-process instead of --cmd')
+
+    parser.add_argument('--no-server', action='store_true',
+        help='use servers already listening on the ports')
+
+    parser.add_argument('--logdir', type=str,
+        help='write server logs here')
+
+    parser.add_argument('-o', '--output', type=argparse.FileType(mode='w'),
+        help='JSONL per-game results')
+
+    parser.add_argument('-q', '--quiet', action='store_true',
+        help='no progress output')
+
+    args = parser.parse_args()
+
+    ports = [args.port + 2 * i for i in range(args.servers)]
+    concurrency = args.concurrency or len(ports) * args.seats
+
+    procs = list()
+    if not args.no_server:
+        procs = start_servers(args.server_dir, args.map, ports, args.seats, args.logdir)
+
+    client = async_online.AsyncPunterClient('127.0.0.1', name='load', cmd=args.cmd.split(), plugin=args.player)
+
+    def report(result):
+        if args.output is not None:
+            args.output.write(json.dumps(result.summary()) + '\n')
+        if not args.quiet:
+            print(': port {} punter {} score {} turns {} {:.2f}s{}'.format(result.port, result.punter,
+                result.score, result.turns, result.elapsed,
+                '' if result.error is None else ' error %s' % result.error), file=sys.stderr)
+
+    try:
+        t = time.perf_counter()
+        results = asyncio.run(load(client, ports, args.seats, args.rounds, concurrency, report))
+        elapsed = time.perf_counter() - t
+    finally:
+        stop_servers(procs)
+
+    ok = [x for x in results if x.error is None]
+    games = len(ok) / args.seats
+    moves = sum(x.turns for x in ok)
+    fallbacks = sum(x.fallbacks for x in ok)
+
+    print('servers {} seats {} concurrency {}'.format(len(ports), args.seats, concurrency))
+    print('games {:.0f} in {:.1f}s: {:.1f} games/minute, {:.1f} moves/s, {} fallbacks, {} errors'.format(
+        games, elapsed, games / elapsed * 60, moves / elapsed, fallbacks, len(results) - len(ok)))
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+import json
+import os
+import random
+import sys
+import time
+
+
+MYDIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(MYDIR, '..', 'code', 'lightning', 'src'))
+
+import player as punter
+import scorer as scoring
+import parallel
+import search
+
+
+def random_board(game_map, players, fill):
+    board = punter.PunterBoard(game_map)
+    rivers = list(range(game_map.river_count))
+    random.shuffle(rivers)
+    for turn, river in enumerate(rivers[:int(len(rivers) * fill)]):
+        board.claim(river, turn % players)
+    return board
+
+
+def run(fn, workers, players, fill, depth, budget, moves):
+    with open(fn, 'r') as fd:
+        game_map = punter.PunterMap.from_protocol(json.load(fd))
+    distances = punter.DistanceTable.build(game_map)
+
+    board = random_board(game_map, players, fill)
+    scorer = scoring.Scorer.from_board(board, distances, players)
+
+    print('{}: {} rivers, fill {:.2f}, depth {}, budget {:.3f}s, {} cpus'.format(
+        os.path.basename(fn), game_map.river_count, fill, depth, budget, os.cpu_count()))
+    print('{:>8} {:>12} {:>10} {:>8} {:>10}'.format('workers', 'iterations', 'iter/s', 'speedup', 'move ms'))
+
+    baseline = None
+    startup = list()
+    for n in workers:
+        t = time.perf_counter()
+        pool = parallel.PlayoutPool(n)
+        try:
+            forked = time.perf_counter()
+            pool.load(game_map.digest(), game_map, distances)
+            loaded = time.perf_counter()
+            # first search pays for worker imports and attaching the tables
+            pool.search(board, scorer, 0, players, loaded + budget, depth=depth)
+            first = time.perf_counter() - loaded
+            startup.append((n, forked - t, loaded - forked, first))
+
+            iterations = 0
+            elapsed = 0
+            for _ in range(moves):
+                _, stats = pool.search(board, scorer, 0, players, time.perf_counter() + budget, depth=depth)
+                iterations += stats.iterations
+                elapsed += stats.elapsed
+        finally:
+            pool.close()
+
+        rate = iterations / elapsed
+        baseline = baseline or rate
+        print('{:>8} {:>12} {:>10.0f} {:>8.2f} {:>10.1f}'.format(
+            n, iterations // moves, rate, rate / baseline, elapsed / moves * 1000))
+
+    for n, fork, tables, first in startup:
+        print('start-up {} workers: pool {:.1f} ms, tables {:.1f} ms, first move {:.1f} ms'.format(
+            n, fork * 1000, tables * 1000, first * 1000))
+
+
+if __name__ == '__main__':
+    import argparse
+
+    default_map = os.path.join(MYDIR, '..', 'server', 'maps', 'gothenburg-sparse.json')
+
+    parser = argparse.ArgumentParser(description='Parallel playout scaling')
+
+    parser.add_argument('map', nargs='?', default=default_map,
+        help='map file, gothenburg-sparse.json')
+
+    parser.add_argument('-w', '--workers', type=int, action='append',
+        help='pool size, 1, 2, 4 and 8 by default')
+
+    parser.add_argument('-n', '--players', type=int, default=4,
+        help='number of players')
+
+    parser.add_argument('-f', '--fill', type=float, default=0.3,
+        help='fraction of rivers claimed')
+
+    parser.add_argument('-d', '--depth', type=int, default=search.SEARCH_DEPTH,
+        help='playout depth')
+
+    parser.add_argument('-b', '--budget', type=float, default=0.8,
+        help='move budget in seconds')
+
+    parser.add_argument('-m', '--moves', type=int, default=3,
+        help='moves timed per pool size')
+
+    parser.add_argument('--seed', type=int, default=2017,
+        help='random seed')
+
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    run(args.map, args.workers or [1, 2, 4, 8], args.players, args.fill, args.depth, args.budget, args.moves)
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+import json
+import os
+import sys
+
+
+MYDIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(MYDIR, '..', 'code', 'lightning', 'src'))
+
+import player as punter
+
+
+PHASES = ('unpack', 'setup', 'process_moves', 'make_claim', 'pack')
+
+
+def load(files):
+    metrics = punter.PhaseMetrics()
+
+    for fd in files:
+        for line in fd:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if not isinstance(record, dict):
+                continue
+            for name, x in (record.get('phases', None) or dict()).items():
+                metrics.add(name, x['wall_ms'], x['cpu_ms'])
+
+    return metrics
+
+
+def report(metrics, histograms=False):
+    names = [x for x in PHASES if x in metrics.histograms]
+    names += sorted(x for x in metrics.histograms if x not in PHASES)
+
+    print('{:<14} {:>7} {:>10} {:>10} {:>8} {:>8} {:>8} {:>8}'.format(
+        'phase', 'count', 'wall ms', 'cpu ms', 'p50', 'p90', 'p99', 'cpu p99'))
+    for name in names:
+        h = metrics.histograms[name]
+        print('{:<14} {:>7} {:>10.3f} {:>10.3f} {:>8} {:>8} {:>8} {:>8}'.format(
+            name, h['count'], h['wall_total'] / h['count'], h['cpu_total'] / h['count'],
+            metrics.percentile(name, 50), metrics.percentile(name, 90), metrics.percentile(name, 99),
+            metrics.percentile(name, 99, kind='cpu')))
+
+    if histograms:
+        bounds = ['<={}'.format(x) for x in metrics.BUCKETS] + ['>{}'.format(metrics.BUCKETS[-1])]
+        for name in names:
+            h = metrics.histograms[name]
+            print()
+            print('{} wall ms'.format(name))
+            peak = max(h['wall']) or 1
+            for bound, n in zip(bounds, h['wall']):
+                if n > 0:
+                    print('{:>8} {:>7} {}'.format(bound, n, '#' * max(1, round(n / peak * 40))))
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Summarize PUNTER_METRICS phase timings')
+
+    parser.add_argument('files', nargs='*', type=argparse.FileType(mode='r'),
+        default=[sys.stdin],
+        help='metrics JSONL files, stdin by default')
+
+    parser.add_argument('--histograms', action='store_true',
+        help='print wall time histograms')
+
+    args = parser.parse_args()
+
+    report(load(args.files), histograms=args.histograms)
@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+import importlib
+import inspect
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+
+from datetime import datetime
+from glob import glob
+
+
+MYDIR = os.path.dirname(os.path.abspath(__file__))
+SRCDIR = os.path.join(MYDIR, '..', 'code', 'lightning', 'src')
+sys.path.insert(0, SRCDIR)
+
+import player as punter
+
+
+METRICS = ('handshake_ms', 'setup_ms', 'move_p50_ms', 'move_p99_ms', 'state_bytes', 'peak_rss_kb')
+
+# what player.py does as a script, for any MODULE:CLASS
+CLIENT = """import importlib, sys
+import player
+module_name, _, class_name = sys.argv[1].rpartition(':')
+player.OfflinePlayer(getattr(importlib.import_module(module_name), class_name)()).run()
+"""
+
+
+def player_classes():
+    return sorted('player:%s' % name for name, cls in inspect.getmembers(punter, inspect.isclass)
+        if issubclass(cls, punter.PunterPlayer) and cls is not punter.PunterPlayer
+            and cls.__module__ == punter.__name__)
+
+
+def load_class(spec):
+    module_name, _, class_name = spec.rpartition(':')
+    return getattr(importlib.import_module(module_name), class_name)
+
+
+def percentile(samples, p):
+    if len(samples) == 0:
+        return None
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(round(p / 100 * (len(samples) - 1))))]
+
+
+def state_size(state):
+    return len(state) if isinstance(state, str) else len(json.dumps(state))
+
+
+def spawn_handshake(spec):
+    t = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, '-u', '-c', CLIENT, spec], bufsize=0, cwd=SRCDIR,
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+    try:
+        transport = punter.PunterFileTransport(proc.stdout, proc.stdin)
+        me = transport.receive()
+        transport.send({'you': me['me']})
+        return time.perf_counter() - t
+    finally:
+        proc.kill()
+        proc.wait()
+        proc.stdout.close()
+        proc.stdin.close()
+
+
+def measure(fn, spec, players=2, turns=None, handshakes=5):
+    import engine
+
+    cls = load_class(spec)
+    with open(fn, 'r') as fd:
+        mapobj = json.load(fd)
+
+    referee = engine.Game(mapobj, [None] * players)
+    states = [None] * players
+
+    # interpreter start-up, imports and the stdio handshake, as the relay sees it
+    handshakes = [spawn_handshake(spec) for _ in range(handshakes)]
+    setups = list()
+    moves = list()
+    sizes = list()
+
+    def offline(message, state=None):
+        player = cls()
+        me = player.handshake()
+        player.handshake({'you': me['me']})
+
+        message = json.loads(json.dumps(message))
+        if state is not None:
+            message['state'] = state
+
+        t = time.perf_counter()
+        response = player.move(message)
+        elapsed = time.perf_counter() - t
+
+        state = response.pop('state')
+        sizes.append(state_size(state))
+        return response, state, elapsed
+
+    for i in range(players):
+        _, states[i], elapsed = offline({'punter': i, 'punters': players, 'map': mapobj})
+        setups.append(elapsed)
+
+    limit = referee.turn_limit if turns is None else min(turns, referee.turn_limit)
+    while referee.turn < limit:
+        i = referee.active
+        response, states[i], elapsed = offline({'move': {'moves': referee.moves[-players:]}}, states[i])
+        moves.append(elapsed)
+        referee.commit_move(i, response)
+
+    ms = lambda x: round(x * 1000, 3) if x is not None else None
+
+    return {
+        'map': os.path.basename(fn),
+        'player': spec,
+        'rivers': referee.turn_limit,
+        'moves': len(moves),
+        'handshake_ms': ms(percentile(handshakes, 50)),
+        'setup_ms': ms(max(setups)),
+        'move_p50_ms': ms(percentile(moves, 50)),
+        'move_p99_ms': ms(percentile(moves, 99)),
+        'state_bytes': max(sizes),
+        'peak_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    }
+
+
+def run(maps, specs, players=2, turns=None, handshakes=5, silent=False):
+    results = list()
+
+    for fn in maps:
+        for spec in specs:
+            cmd = [sys.executable, os.path.abspath(__file__), '--worker', fn, '--player', spec,
+                '--players', str(players), '--handshakes', str(handshakes)]
+            if turns is not None:
+                cmd += ['--turns', str(turns)]
+
+            proc = subprocess.run(cmd, stdout=subprocess.PIPE, universal_newlines=True)
+            if proc.returncode != 0:
+                result = {'map': os.path.basename(fn), 'player': spec, 'error': proc.returncode}
+            else:
+                result = json.loads(proc.stdout)
+            results.append(result)
+
+            if not silent:
+                print(format_row(result), file=sys.stderr)
+
+    return {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'players': players,
+        'turns': turns,
+        'results': results,
+    }
+
+
+def format_row(x):
+    if 'error' in x:
+        return '{:<28} {:<28} error {}'.format(x['map'], x['player'], x['error'])
+    return '{:<28} {:<28} {:>8} {:>10} {:>10} {:>10} {:>10} {:>10} {:>10}'.format(
+        x['map'], x['player'], x['moves'], *(x[k] for k in METRICS))
+
+
+def diff(old, new, threshold, min_ms=0.5):
+    index = {(x['map'], x['player']): x for x in old['results']}
+    regressions = 0
+
+    print('{:<28} {:<28} {:<14} {:>12} {:>12} {:>8}'.format('map', 'player', 'metric', 'old', 'new', 'change'))
+    for x in new['results']:
+        y = index.get((x['map'], x['player']), None)
+        if y is None or 'error' in x or 'error' in y:
+            continue
+        for metric in METRICS:
+            a = y.get(metric, None)
+            b = x.get(metric, None)
+            if not a or b is None:
+                continue
+            change = b / a - 1
+            flag = ''
+            if metric.endswith('_ms') and abs(b - a) < min_ms:
+                pass
+            elif change > threshold:
+                flag = '  REGRESSION'
+                regressions += 1
+            elif change < -threshold:
+                flag = '  improved'
+            print('{:<28} {:<28} {:<14} {:>12} {:>12} {:>+7.1%}{}'.format(
+                x['map'], x['player'], metric, a, b, change, flag))
+
+    return regressions
+
+
+if __name__ == '__main__':
+    import argparse
+
+    default_maps = os.path.join(MYDIR, '..', 'server', 'maps')
+
+    parser = argparse.ArgumentParser(description='Offline player benchmark: latency, state size and memory per map')
+
+    parser.add_argument('maps', nargs='*',
+        help='map files, all of server/maps by default')
+
+    parser.add_argument('-p', '--player', action='append', metavar='MODULE:CLASS',
+        help='player class, all PunterPlayer subclasses in player.py by default')
+
+    parser.add_argument('-n', '--players', type=int, default=2,
+        help='punters per game')
+
+    parser.add_argument('-t', '--turns', type=int,
+        help='stop after this many turns, the whole game by default')
+
+    parser.add_argument('--handshakes', type=int, default=5,
+        help='client processes spawned to time the handshake, 5')
+
+    parser.add_argument('-o', '--output', type=argparse.FileType(mode='w'),
+        default=sys.stdout,
+        help='JSON report file')
+
+    parser.add_argument('--diff', nargs=2, metavar=('OLD', 'NEW'),
+        help='compare two reports, exit 1 on regressions')
+
+    parser.add_argument('--threshold', type=float, default=0.1,
+        help='relative change flagged by --diff, 0.1')
+
+    parser.add_argument('--min-ms', type=float, default=0.5,
+        help='timing changes below this many ms are not flagged by --diff, 0.5')
+
+    parser.add_argument('--worker', type=str, metavar='MAP',
+        help=argparse.SUPPRESS)
+
+    parser.add_argument('-q', '--quiet', action='store_true',
+        help='no progress output')
+
+    args = parser.parse_args()
+
+    if args.worker is not None:
+        print(json.dumps(measure(args.worker, args.player[0], players=args.players, turns=args.turns,
+            handshakes=args.handshakes)))
+        sys.exit(0)
+
+    if args.diff is not None:
+        with open(args.diff[0], 'r') as fd:
+            old = json.load(fd)
+        with open(args.diff[1], 'r') as fd:
+            new = json.load(fd)
+        sys.exit(1 if diff(old, new, args.threshold, args.min_ms) > 0 else 0)
+
+    maps = args.maps or sorted((x for x in glob(os.path.join(default_maps, '*.json'))
+        if os.path.basename(x) != 'maps.json'), key=os.path.getsize)
+
+    if not args.quiet:
+        print('{:<28} {:<28} {:>8} {:>10} {:>10} {:>10} {:>10} {:>10} {:>10}'.format(
+            'map', 'player', 'moves', 'handshake', 'setup', 'p50', 'p99', 'state', 'rss kb'), file=sys.stderr)
+
+    report = run(maps, args.player or player_classes(), players=args.players, turns=args.turns,
+        handshakes=args.handshakes, silent=args.quiet)
+    json.dump(report, args.output, indent=2)
+    args.output.write('\n')
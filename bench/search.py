@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+import json
+import os
+import random
+import sys
+import time
+
+
+MYDIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(MYDIR, '..', 'code', 'lightning', 'src'))
+
+import player as punter
+import scorer as scoring
+import search
+import zobrist
+
+
+def random_board(game_map, players, fill):
+    board = punter.PunterBoard(game_map)
+    rivers = list(range(game_map.river_count))
+    random.shuffle(rivers)
+    for turn, river in enumerate(rivers[:int(len(rivers) * fill)]):
+        board.claim(river, turn % players)
+    return board
+
+
+def run(maps, players, fills, depths, budget, table_size=0):
+    print('{:<28} {:>5} {:>5} {:>10} {:>10} {:>12} {:>8} {:>6}'.format(
+        'map', 'fill', 'depth', 'candidates', 'iterations', 'iter/s', 'best', 'hits'))
+
+    for fn in maps:
+        with open(fn, 'r') as fd:
+            game_map = punter.PunterMap.from_protocol(json.load(fd))
+        distances = punter.DistanceTable.build(game_map)
+
+        for fill in fills:
+            board = random_board(game_map, players, fill)
+            scorer = scoring.Scorer.from_board(board, distances, players)
+
+            keys = zobrist.ZobristKeys.for_map(game_map, players) if table_size > 0 else None
+
+            for depth in depths:
+                table = zobrist.TranspositionTable(table_size) if keys is not None else None
+                if table is not None:
+                    table.new_search()
+                    search.PlayoutSearch(board, scorer, 0, players, depth=depth,
+                        keys=keys, table=table).run(time.perf_counter() + budget)
+                    table.new_search()
+
+                engine = search.PlayoutSearch(board, scorer, 0, players, depth=depth, keys=keys, table=table)
+                if engine.run(time.perf_counter() + budget) is None:
+                    continue
+                stats = engine.stats()
+                print('{:<28} {:>5.2f} {:>5} {:>10} {:>10} {:>12.0f} {:>8} {:>6}'.format(
+                    os.path.basename(fn), fill, depth, stats.candidates,
+                    stats.iterations, stats.rate, stats.best_visits, stats.table_hits))
+
+
+if __name__ == '__main__':
+    import argparse
+
+    default_maps = os.path.join(MYDIR, '..', 'server', 'maps')
+
+    parser = argparse.ArgumentParser(description='Playout search throughput')
+
+    parser.add_argument('maps', nargs='*',
+        help='map files, lambda and gothenburg-sparse by default')
+
+    parser.add_argument('-n', '--players', type=int, default=4,
+        help='number of players')
+
+    parser.add_argument('-f', '--fill', type=float, action='append',
+        help='fraction of rivers claimed, 0.1 and 0.5 by default')
+
+    parser.add_argument('-d', '--depth', type=int, action='append',
+        help='playout depth, 2, 4 and 8 by default')
+
+    parser.add_argument('-b', '--budget', type=float, default=0.8,
+        help='search budget in seconds')
+
+    parser.add_argument('-t', '--table-size', type=int, default=0,
+        help='transposition table size, warmed by one search of the same position')
+
+    parser.add_argument('--seed', type=int, default=2017,
+        help='random seed')
+
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+
+    maps = args.maps or [os.path.join(default_maps, x) for x in ('lambda.json', 'gothenburg-sparse.json')]
+
+    run(maps, args.players, args.fill or [0.1, 0.5], args.depth or [2, 4, 8], args.budget, args.table_size)
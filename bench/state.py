@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+from glob import glob
+
+
+MYDIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(MYDIR, '..', 'code', 'lightning', 'src'))
+
+import player as punter
+
+
+def bench_map(fn, codec, cache_dir=None, players=2, samples=20, repeat=5):
+    with open(fn, 'r') as fd:
+        mapobj = json.load(fd)
+
+    player = punter.RandomPlayer()
+    player.state_codec = punter.STATE_CODECS[codec]()
+    player.map_cache = punter.MapCache(cache_dir) if cache_dir else None
+    player.move({'punter': 0, 'punters': players, 'map': mapobj})
+
+    total = player.map.river_count
+    turns = set(round(i * (total - 1) / max(1, samples - 1)) for i in range(samples))
+
+    rivers = list(range(total))
+    random.shuffle(rivers)
+
+    sizes = []
+    encode = []
+    decode = []
+
+    for turn, river in enumerate(rivers):
+        player.board.claim(river, turn % players)
+
+        if turn not in turns:
+            continue
+
+        t = time.perf_counter()
+        for _ in range(repeat):
+            response = player._pack_state(dict())
+            packet = json.dumps(response['state'], separators=(',', ':'))
+        encode.append((time.perf_counter() - t) / repeat)
+
+        sizes.append(len(packet))
+
+        t = time.perf_counter()
+        for _ in range(repeat):
+            player._unpack_state({'state': json.loads(packet)})
+        decode.append((time.perf_counter() - t) / repeat)
+
+    n = max(1, len(sizes))
+    return {
+        'map': os.path.basename(fn),
+        'codec': codec,
+        'map_cache': bool(cache_dir),
+        'rivers': total,
+        'state_bytes': round(sum(sizes) / n),
+        'state_bytes_max': max(sizes or [0]),
+        'encode_us': round(sum(encode) / n * 1e6, 1),
+        'decode_us': round(sum(decode) / n * 1e6, 1),
+    }
+
+
+def run(maps, codecs, samples, repeat, as_json=False):
+    rows = []
+    with tempfile.TemporaryDirectory() as cache_dir:
+        for fn in maps:
+            for codec in codecs:
+                for cache in (None, cache_dir):
+                    row = bench_map(fn, codec, cache_dir=cache, samples=samples, repeat=repeat)
+                    rows.append(row)
+                    if as_json:
+                        print(json.dumps(row))
+                    else:
+                        print('{map:<28} {codec:<5} {cache:<6} {rivers:>6} {state_bytes:>9} {state_bytes_max:>9} {encode_us:>10} {decode_us:>10}'
+                            .format(cache=('cache' if row['map_cache'] else 'inline'), **row))
+    return rows
+
+
+if __name__ == '__main__':
+    import argparse
+
+    default_maps = os.path.join(MYDIR, '..', 'server', 'maps')
+
+    parser = argparse.ArgumentParser(description='Offline state size and encode/decode time per turn')
+
+    parser.add_argument('maps', nargs='*',
+        help='map files, all of server/maps by default')
+
+    parser.add_argument('-c', '--codec', action='append', choices=sorted(punter.STATE_CODECS),
+        help='state codec, all by default')
+
+    parser.add_argument('-n', '--samples', type=int, default=20,
+        help='turns sampled per game')
+
+    parser.add_argument('-r', '--repeat', type=int, default=5,
+        help='repetitions per sample')
+
+    parser.add_argument('--json', action='store_true',
+        help='print JSON lines')
+
+    args = parser.parse_args()
+
+    maps = args.maps or sorted(x for x in glob(os.path.join(default_maps, '*.json'))
+        if os.path.basename(x) != 'maps.json')
+
+    if not args.json:
+        print('{:<28} {:<5} {:<6} {:>6} {:>9} {:>9} {:>10} {:>10}'.format(
+            'map', 'codec', 'map', 'rivers', 'bytes', 'max bytes', 'encode us', 'decode us'))
+
+    run(maps, args.codec or sorted(punter.STATE_CODECS), samples=args.samples, repeat=args.repeat, as_json=args.json)
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+import io
+import json
+import os
+import sys
+import threading
+import time
+
+from collections import OrderedDict
+
+
+MYDIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(MYDIR, '..', 'code'))
+
+import online
+
+
+class LegacyTransport(online.PunterFileTransport):
+    def receive(self):
+        chunks = []
+
+        total = 20
+        body = ''
+
+        while True:
+            chunk = self.read(1)
+            if chunk == b'':
+                raise online.PunterTransportError()
+
+            chunks.append(chunk)
+
+            data = str(b''.join(chunks), 'utf-8')
+            parts = data.split(':', 1)
+            if len(parts) == 2:
+                body = parts[1]
+                total = int(parts[0]) - len(body)
+                break
+
+        chunks = []
+
+        while total > 0:
+            chunk = self.read(total)
+            if chunk == b'':
+                raise online.PunterTransportError()
+
+            chunks.append(chunk)
+            total -= len(chunk)
+
+        response = b''.join(chunks)
+        response = body + str(response, 'utf-8')
+        response = json.loads(response, object_pairs_hook=OrderedDict)
+        return response
+
+
+class FrameOnlyTransport(online.PunterFileTransport):
+    def receive(self):
+        return self.reader.read_frame()
+
+
+def frames(message, count):
+    t = online.PunterMemoryTransport()
+    for _ in range(count):
+        t.send(message)
+    return t.write_buffer.getvalue()
+
+
+def bench_pipe(transport_class, data, count):
+    rfd, wfd = os.pipe()
+
+    def writer():
+        with io.open(wfd, 'wb', 0) as fd:
+            view = memoryview(data)
+            while len(view) > 0:
+                n = fd.write(view[:65536])
+                view = view[n:]
+
+    thread = threading.Thread(target=writer)
+
+    with io.open(rfd, 'rb', 0) as fd:
+        transport = transport_class(fd, None)
+
+        t = time.perf_counter()
+        thread.start()
+        for _ in range(count):
+            transport.receive()
+        elapsed = time.perf_counter() - t
+
+    thread.join()
+    return elapsed / count
+
+
+def bench_memory(transport_class, data, count):
+    transport = transport_class(io.BytesIO(data), None)
+
+    t = time.perf_counter()
+    for _ in range(count):
+        transport.receive()
+    return (time.perf_counter() - t) / count
+
+
+def run(fn, count):
+    with open(fn, 'r') as fd:
+        mapobj = json.load(fd)
+
+    message = {'punter': 0, 'punters': 2, 'map': mapobj}
+    data = frames(message, count)
+
+    print('{}: {} frames of {} bytes'.format(os.path.basename(fn), count, len(data) // count))
+    print('{:<10} {:<8} {:>10}'.format('reader', 'source', 'ms/frame'))
+
+    readers = (
+        ('legacy', LegacyTransport),
+        ('buffered', online.PunterFileTransport),
+        ('framing', FrameOnlyTransport),
+    )
+
+    for name, cls in readers:
+        for source, bench in (('pipe', bench_pipe), ('memory', bench_memory)):
+            elapsed = bench(cls, data, count)
+            print('{:<10} {:<8} {:>10.3f}'.format(name, source, elapsed * 1000))
+
+
+if __name__ == '__main__':
+    import argparse
+
+    default_map = os.path.join(MYDIR, '..', 'server', 'maps', 'nara-scaled.json')
+
+    parser = argparse.ArgumentParser(description='Frame reader microbenchmark')
+
+    parser.add_argument('map', nargs='?', default=default_map,
+        help='map file for the setup message, nara-scaled.json')
+
+    parser.add_argument('-n', '--frames', type=int, default=20,
+        help='pipelined frames to read')
+
+    args = parser.parse_args()
+
+    run(args.map, args.frames)
@@ -0,0 +1,393 @@
+#!/usr/bin/env python3 -u
+import asyncio
+import io
+import os
+import time
+
+from online import (FallbackMoves, LatencyStats, MOVE_MARGIN, MOVE_TIMEOUT,
+    PunterError, PunterServerError, PunterTransportError, json_codec, load_player_class)
+
+
+MOVE_KEYS = ('claim', 'pass', 'splurge', 'option', 'move')
+
+
+class AsyncPunterTransport:
+    MAX_HEADER = 20
+
+    def __init__(self, reader, writer, codec=None):
+        self.reader = reader
+        self.writer = writer
+        self.codec = codec or json_codec()
+        self.bytes_sent = 0
+        self.bytes_received = 0
+
+    async def send(self, obj):
+        packet = self.codec.dumps(obj)
+        header = b'%d:' % len(packet)
+        self.writer.writelines([header, packet])
+        self.bytes_sent += len(header) + len(packet)
+        await self.writer.drain()
+
+    async def receive(self):
+        try:
+            header = await self.reader.readuntil(b':')
+        except asyncio.IncompleteReadError:
+            raise PunterTransportError()
+        except asyncio.LimitOverrunError:
+            raise PunterTransportError('invalid frame header')
+
+        if len(header) > self.MAX_HEADER:
+            raise PunterTransportError('invalid frame header')
+
+        size = int(header[:-1])
+        try:
+            body = await self.reader.readexactly(size)
+        except asyncio.IncompleteReadError:
+            raise PunterTransportError()
+
+        self.bytes_received += len(header) + size
+        return self.codec.loads(body)
+
+    def close(self):
+        self.writer.close()
+
+
+class AsyncOfflinePlayer:
+    def __init__(self, cmd, logfile=None, move_timeout=MOVE_TIMEOUT, margin=MOVE_MARGIN):
+        self.cmd = cmd
+        self.logfile = logfile
+        self.state = None
+        self.move_timeout = move_timeout
+        self.margin = margin
+        self.fallback = FallbackMoves()
+        self.fallbacks = 0
+        self.pending_moves = None
+        self.timeout_notice = None
+        self.name = None
+
+    async def _spawn(self):
+        stderr = io.open(self.logfile, 'a') if self.logfile else asyncio.subprocess.DEVNULL
+        try:
+            proc = await asyncio.create_subprocess_exec(*self.cmd,
+                stdin=asyncio.subprocess.PIPE,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=stderr)
+        finally:
+            if self.logfile:
+                stderr.close()
+
+        return proc
+
+    async def _handshake(self, proc):
+        transport = AsyncPunterTransport(proc.stdout, proc.stdin)
+
+        handshake = await transport.receive()
+        if 'me' not in handshake:
+            raise PunterError()
+        self.name = handshake['me']
+        await transport.send({'you': self.name})
+
+        return transport
+
+    async def _close(self, proc):
+        if proc.returncode is None:
+            proc.kill()
+        await proc.wait()
+
+    async def play(self, message):
+        received = time.perf_counter()
+        self.fallback.update(message)
+
+        move = message.get('move', None)
+        deadline = None
+        if move is not None and self.move_timeout is not None:
+            deadline = received + self.move_timeout - self.margin
+
+        message = dict(message)
+        message['state'] = self.state
+        if self.timeout_notice is not None:
+            message['timeout'], self.timeout_notice = self.timeout_notice, None
+
+        if 'stop' in message:
+            # nothing to answer, not worth a client process
+            return None
+
+        if self.pending_moves is not None and move is not None:
+            x = dict(move)
+            x['moves'] = self.pending_moves + (x.get('moves', None) or list())
+            message['move'] = x
+
+        proc = None
+        try:
+            proc = await self._spawn()
+            transport = await self._handshake(proc)
+            await transport.send(message)
+
+            if deadline is not None:
+                timeout = max(0, deadline - time.perf_counter())
+                response = await asyncio.wait_for(transport.receive(), timeout)
+            else:
+                response = await transport.receive()
+        except (OSError, ValueError, PunterError, asyncio.TimeoutError):
+            if move is None:
+                raise
+            # the client was late, died or sent garbage, the game goes on
+            self.fallbacks += 1
+            self.pending_moves = message['move'].get('moves', None) or list()
+            return self.fallback.move()
+        finally:
+            if proc is not None:
+                await self._close(proc)
+
+        self.pending_moves = None
+        self.state = response.pop('state', None)
+        return response
+
+    def timeout(self, seconds):
+        self.timeout_notice = seconds
+        if self.move_timeout is not None:
+            self.move_timeout = seconds
+
+
+class AsyncInProcessPlayer:
+    def __init__(self, player):
+        self.player = player
+        self.fallbacks = 0
+
+        me = self.player.handshake()
+        self.name = me.get('me', None)
+        self.player.handshake({'you': self.name})
+
+    async def play(self, message):
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(None, self.player.play, message)
+
+    def timeout(self, seconds):
+        self.player.play({'timeout': seconds})
+
+
+class GameResult:
+    def __init__(self, port, name):
+        self.port = port
+        self.name = name
+        self.punter = None
+        self.scores = None
+        self.turns = 0
+        self.elapsed = 0
+        self.fallbacks = 0
+        self.timeouts = 0
+        self.error = None
+        self.latency = LatencyStats()
+
+    @property
+    def score(self):
+        for x in self.scores or list():
+            if x.get('punter', None) == self.punter:
+                return x.get('score', None)
+
+    def summary(self):
+        return {
+            'port': self.port,
+            'name': self.name,
+            'punter': self.punter,
+            'score': self.score,
+            'turns': self.turns,
+            'elapsed': round(self.elapsed, 3),
+            'fallbacks': self.fallbacks,
+            'timeouts': self.timeouts,
+            'error': self.error,
+            'latency': self.latency.summary(),
+        }
+
+
+class AsyncPunterClient:
+    CONNECT_TIMEOUT = 2
+    RETRY_DELAY = 0.2
+
+    def __init__(self, host, name='online-player', cmd=None, plugin=None, logfile=None,
+            move_timeout=MOVE_TIMEOUT, margin=MOVE_MARGIN, retry_for=30):
+        self.host = host
+        self.name = name
+        self.cmd = cmd
+        self.plugin = plugin
+        # import once, every game gets a fresh instance
+        self.player_class = load_player_class(plugin) if plugin is not None else None
+        self.logfile = logfile
+        self.move_timeout = move_timeout
+        self.margin = margin
+        self.retry_for = retry_for
+
+    def _player(self):
+        if self.player_class is not None:
+            return AsyncInProcessPlayer(self.player_class())
+        return AsyncOfflinePlayer(self.cmd, logfile=self.logfile,
+            move_timeout=self.move_timeout, margin=self.margin)
+
+    async def _connect(self, port):
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(self.host, port), self.CONNECT_TIMEOUT)
+
+        transport = AsyncPunterTransport(reader, writer)
+        try:
+            await transport.send({'me': self.name})
+            response = await transport.receive()
+            if 'you' not in response:
+                raise PunterServerError('handshake failed')
+        except:
+            transport.close()
+            raise
+
+        return transport
+
+    async def play(self, port):
+        result = GameResult(port, self.name)
+        started = time.perf_counter()
+        give_up = started + self.retry_for
+
+        while True:
+            transport = None
+            try:
+                transport = await self._connect(port)
+                message = await transport.receive()
+                break
+            except (OSError, asyncio.TimeoutError, PunterError) as e:
+                if transport is not None:
+                    transport.close()
+                if time.perf_counter() >= give_up:
+                    result.error = 'connect: %s' % (e or type(e).__name__)
+                    return result
+                await asyncio.sleep(self.RETRY_DELAY)
+
+        player = self._player()
+        started = time.perf_counter()
+
+        try:
+            while True:
+                timeout = message.get('timeout', None)
+                if timeout is not None:
+                    result.timeouts += 1
+                    player.timeout(timeout)
+                    message = await transport.receive()
+                    continue
+
+                if 'map' in message:
+                    result.punter = message.get('punter', None)
+
+                stop = message.get('stop', None)
+                if stop is not None:
+                    result.scores = stop.get('scores', None)
+                    await player.play(message)
+                    break
+
+                response = await player.play(message)
+                if response is None:
+                    raise PunterError('no response')
+
+                t = time.perf_counter()
+                await transport.send(response)
+                message = await transport.receive()
+                result.latency.add(time.perf_counter() - t)
+
+                if any(x in response for x in MOVE_KEYS):
+                    result.turns += 1
+
+        except (OSError, ValueError, PunterError) as e:
+            result.error = '%s: %s' % (type(e).__name__, e)
+
+        finally:
+            transport.close()
+
+        result.elapsed = time.perf_counter() - started
+        result.fallbacks = player.fallbacks
+        return result
+
+
+async def run_games(client, ports, games, concurrency, on_result=None):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def game(port):
+        async with semaphore:
+            result = await client.play(port)
+        if on_result is not None:
+            on_result(result)
+        return result
+
+    return await asyncio.gather(*(game(ports[i % len(ports)]) for i in range(games)))
+
+
+def parse_ports(text):
+    ports = list()
+    for part in text.split(','):
+        first, _, last = part.partition('-')
+        ports.extend(range(int(first), int(last or first) + 1))
+    return ports
+
+
+if __name__ == '__main__':
+    import argparse
+    import json
+
+    default_host = '127.0.0.1'
+
+    default_cmd = os.path.join(os.path.dirname(__file__), 'punter')
+
+    parser = argparse.ArgumentParser(description='Play many online games concurrently from one process')
+
+    parser.add_argument('-a', '--host', type=str,
+        default=default_host,
+        help='server host, %s' % default_host)
+
+    parser.add_argument('-p', '--ports', type=str, default='9000',
+        help='server ports, e.g. 9000-9009,9020')
+
+    parser.add_argument('-g', '--games', type=int, default=1,
+        help='games to play, spread over the ports')
+
+    parser.add_argument('-c', '--concurrency', type=int, default=32,
+        help='games in flight at once')
+
+    parser.add_argument('-n', '--name', type=str, default='online-player',
+        help='player name')
+
+    parser.add_argument('--cmd', type=str, default=default_cmd,
+        help='offline client command line')
+
+    parser.add_argument('--player', type=str, metavar='MODULE:CLASS',
+        help='run a Python PunterPlayer in-process instead of --cmd')
+
+    parser.add_argument('--log', type=str,
+        help='client log file')
+
+    parser.add_argument('-t', '--move-timeout', type=float, default=MOVE_TIMEOUT,
+        help='server move timeout in seconds, %s' % MOVE_TIMEOUT)
+
+    parser.add_argument('--margin', type=float, default=MOVE_MARGIN,
+        help='send a fallback move this many seconds before the move timeout, %s' % MOVE_MARGIN)
+
+    parser.add_argument('--json', action='store_true',
+        help='print results as JSON lines')
+
+    parser.add_argument('-s', '--silent', action='store_true',
+        help='be quiet')
+
+    args = parser.parse_args()
+
+    client = AsyncPunterClient(args.host, name=args.name, cmd=args.cmd.split(), plugin=args.player,
+        logfile=args.log, move_timeout=args.move_timeout, margin=args.margin)
+
+    def report(result):
+        if args.json:
+            print(json.dumps(result.summary()))
+        elif not args.silent:
+            x = result.summary()
+            print(': port {port} punter {punter} score {score} turns {turns} {elapsed}s'
+                ' fallbacks {fallbacks} error {error}'.format(**x))
+
+    started = time.perf_counter()
+    results = asyncio.run(run_games(client, parse_ports(args.ports), args.games, args.concurrency, report))
+    elapsed = time.perf_counter() - started
+
+    if not args.silent and not args.json:
+        done = sum(1 for x in results if x.error is None)
+        print(': {} games in {:.1f}s, {:.1f} games/minute, {} errors'.format(
+            done, elapsed, done / elapsed * 60, len(results) - done))
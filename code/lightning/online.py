@@ -1,11 +1,20 @@
 #!/usr/bin/env python3 -u
 import io
 import json
+import os
 import socket
 import subprocess
 
 from collections import OrderedDict
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+JSON_BACKEND=os.environ.get('PUNTER_JSON', None)
+
 
 class PunterError(Exception):
     pass
@@ -19,51 +28,119 @@ class PunterServerError(PunterError):
     pass
 
 
-class PunterTransport:
-    def send(self, obj):
-        # print('< sending', obj)
-        packet = json.dumps(obj, separators=(',', ':'))
-        packet = bytes(packet, 'utf-8')
-        header = bytes('%d:' % len(packet), 'ascii')
-        self.write(header)
-        self.write(packet)
+class JsonCodec:
+    def __init__(self, ordered=False):
+        self.object_pairs_hook = OrderedDict if ordered else None
 
-    def receive(self):
-        chunks = []
+    def dumps(self, obj):
+        return bytes(json.dumps(obj, separators=(',', ':')), 'utf-8')
 
-        total = 20
-        body = ''
+    def loads(self, data):
+        return json.loads(data, object_pairs_hook=self.object_pairs_hook)
 
-        while True:
-            chunk = self.read(1)
-            if chunk == b'':
+
+class OrjsonCodec:
+    def dumps(self, obj):
+        return orjson.dumps(obj)
+
+    def loads(self, data):
+        return orjson.loads(data)
+
+
+JSON_CODECS = {
+    'json': JsonCodec,
+    'json-ordered': lambda: JsonCodec(ordered=True),
+}
+
+if orjson is not None:
+    JSON_CODECS['orjson'] = OrjsonCodec
+
+
+def json_codec(name=None):
+    name = name or JSON_BACKEND
+    if name not in JSON_CODECS:
+        name = 'orjson' if orjson is not None else 'json'
+    return JSON_CODECS[name]()
+
+
+class PunterFrameReader:
+    CHUNK_SIZE = 65536
+    MAX_HEADER = 20
+
+    def __init__(self, transport):
+        self.transport = transport
+        self.buffer = bytearray()
+
+    def read_frame(self):
+        offset = self._read_header()
+        size = int(self.buffer[:offset])
+        start = offset + 1
+
+        if len(self.buffer) - start >= size:
+            body = self.buffer[start:start + size]
+            del self.buffer[:start + size]
+            return body
+
+        body = bytearray(size)
+        view = memoryview(body)
+
+        pos = len(self.buffer) - start
+        view[:pos] = self.buffer[start:]
+        self.buffer.clear()
+
+        while pos < size:
+            n = self.transport.readinto(view[pos:])
+            if n == 0:
                 raise PunterTransportError()
+            if n is not None:
+                pos += n
 
-            chunks.append(chunk)
+        return body
 
-            data = str(b''.join(chunks), 'utf-8')
-            parts = data.split(':', 1)
-            if len(parts) == 2:
-                body = parts[1]
-                total = int(parts[0]) - len(body)
-                break
+    def _read_header(self):
+        offset = self.buffer.find(b':')
 
-        chunks = []
+        while offset < 0:
+            if len(self.buffer) > self.MAX_HEADER:
+                raise PunterTransportError('invalid frame header')
 
-        while total > 0:
-            chunk = self.read(total)
+            chunk = self.transport.read(self.CHUNK_SIZE)
             if chunk == b'':
                 raise PunterTransportError()
 
-            chunks.append(chunk)
-            total -= len(chunk)
+            if chunk is not None:
+                self.buffer += chunk
+                offset = self.buffer.find(b':')
+
+        return offset
 
-        response = b''.join(chunks)
-        response = body + str(response, 'utf-8')
-        response = json.loads(response, object_pairs_hook=OrderedDict)
-        # print('> received', response)
+
+class PunterTransport:
+    def __init__(self, codec=None):
+        self.reader = PunterFrameReader(self)
+        self.codec = codec or json_codec()
+
+    def send(self, obj):
+        # print('< sending', obj)
+        packet = self.codec.dumps(obj)
+        header = bytes('%d:' % len(packet), 'ascii')
+        self.writev([header, packet])
+
+    def writev(self, buffers):
+        self.write(b''.join(buffers))
+
+    def receive(self):
+        body = self.reader.read_frame()
+        response = self.codec.loads(body)
         return response
 
+    def readinto(self, view):
+        chunk = self.read(len(view))
+        if chunk:
+            view[:len(chunk)] = chunk
+            return len(chunk)
+        return None if chunk is None else 0
+
     def close(self):
         pass
 
@@ -86,6 +163,9 @@ class PunterFileTransport(PunterTransport):
     def read(self, n):
         return self.rfile.read(n)
 
+    def readinto(self, view):
+        return self.rfile.readinto(view)
+
 
 class PunterFilenoTransport(PunterFileTransport):
     def __init__(self, rfd, wfd):
@@ -94,6 +174,21 @@ class PunterFilenoTransport(PunterFileTransport):
         self.samefds = rfd == wfd
         super().__init__(self.rfile, self.wfile)
 
+    def writev(self, buffers):
+        if not hasattr(os, 'writev'):
+            return super().writev(buffers)
+
+        fd = self.wfile.fileno()
+        views = [memoryview(x) for x in buffers]
+
+        while len(views) > 0:
+            n = os.writev(fd, views)
+            while len(views) > 0 and n >= len(views[0]):
+                n -= len(views[0])
+                views.pop(0)
+            if n > 0:
+                views[0] = views[0][n:]
+
     def close(self):
         self.rfile.close()
         if not self.samefds:
@@ -101,13 +196,14 @@ class PunterFilenoTransport(PunterFileTransport):
 
 
 class PunterSocketTransport(PunterFilenoTransport):
-    def __init__(self, socket):
-        super().__init__(rfd=socket.fileno(), wfd=socket.fileno())
-        self.socket = socket
+    def __init__(self, sock):
+        super().__init__(rfd=sock.fileno(), wfd=sock.fileno())
+        self.socket = sock
+        self.socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
 
     def close(self):
         super().close()
-        self.socket.close()
+        self.socket.detach()
 
 
 class PunterMemoryTransport(PunterTransport):
@@ -185,7 +281,7 @@ class OfflinePlayer(Player):
     def write(self, response):
         self._open_process()
 
-        response = OrderedDict(response)
+        response = dict(response)
         response['state'] = self.state
 
         self.transport.send(response)
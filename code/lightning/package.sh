@@ -12,6 +12,9 @@ tar -czf "$TARGET" \
     install \
     PACKAGES \
     README \
-    src/player.py
+    src/player.py \
+    src/scorer.py \
+    src/search.py \
+    src/zobrist.py
 
 md5 "$TARGET"
@@ -0,0 +1,421 @@
+#!/usr/bin/env python3
+import json
+import os
+import random
+import sys
+import time
+import traceback
+
+from collections import deque
+
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+
+from online import load_player
+
+
+def river_key(source, target):
+    return (source, target) if source <= target else (target, source)
+
+
+def map_distances(mines, rivers):
+    graph = dict()
+    for source, target in rivers:
+        graph.setdefault(source, list()).append(target)
+        graph.setdefault(target, list()).append(source)
+
+    res = dict()
+    for mine in mines:
+        res[(mine, mine)] = 0
+        queue = deque([mine])
+        while len(queue) > 0:
+            current = queue.popleft()
+            d = res[(mine, current)] + 1
+            for x in graph.get(current, ()):
+                if (mine, x) not in res:
+                    res[(mine, x)] = d
+                    queue.append(x)
+    return res
+
+
+class Game:
+    def __init__(self, game_map, players, futures=False, options=False, splurges=False, names=None,
+            strict=False):
+        self.map = game_map
+        self.players = players
+        self.count = len(players)
+        self.names = names or ['punter-%d' % i for i in range(self.count)]
+
+        self.ext_futures = futures
+        self.ext_options = options
+        self.ext_splurges = splurges
+        self.strict = strict
+
+        self.sites = set(x['id'] for x in game_map.get('sites', list()))
+        self.mines = list(game_map.get('mines', list()))
+        river_list = [(x['source'], x['target']) for x in game_map.get('rivers', list())]
+        self.rivers = set(river_key(x, y) for x, y in river_list)
+        self.turn_limit = len(river_list)
+        self.distances = map_distances(self.mines, river_list)
+
+        self.all_claims = dict()
+        self.all_options = dict()
+        self.claims = [list() for _ in range(self.count)]
+        self.options = [list() for _ in range(self.count)]
+        self.passes = [0] * self.count
+        self.futures = [list() for _ in range(self.count)]
+        self.moves = [self._pass(i) for i in range(self.count)]
+
+        self.active = 0
+        self.turn = 0
+        self.log = list()
+
+        self.elapsed = [0] * self.count
+        self.errors = [0] * self.count
+
+    def _settings(self):
+        settings = dict()
+        if self.ext_futures:
+            settings['futures'] = True
+        if self.ext_options:
+            settings['options'] = True
+        if self.ext_splurges:
+            settings['splurges'] = True
+        return settings
+
+    def _call(self, player_id, message):
+        player = self.players[player_id]
+        t = time.perf_counter()
+        try:
+            response = player.play(message)
+        except Exception:
+            if self.strict:
+                raise
+            # once per player, a crashing bot must not look like a weak one
+            if self.errors[player_id] == 0:
+                print('player {} {} failed, passing from now on when it does:'.format(
+                    player_id, self.names[player_id]), file=sys.stderr)
+                traceback.print_exc()
+            self.errors[player_id] += 1
+            response = None
+        self.elapsed[player_id] += time.perf_counter() - t
+
+        if response is not None:
+            response = dict(response)
+            response.pop('state', None)
+        return response
+
+    def handshake(self):
+        for i, player in enumerate(self.players):
+            me = player.handshake()
+            player.handshake({'you': me.get('me', None) if me else None})
+
+    def setup(self):
+        template = {'punter': 0, 'punters': self.count, 'map': self.map}
+        settings = self._settings()
+        if settings:
+            template['settings'] = settings
+        self.log.append(template)
+
+        for i in range(self.count):
+            message = dict(template)
+            message['punter'] = i
+            response = self._call(i, message) or dict()
+
+            if self.ext_futures:
+                self.futures[i] = self._validate_futures(response.get('futures', None))
+
+        self.log.append({'start': [{'punter': i, 'name': name} for i, name in enumerate(self.names)]})
+
+    def _validate_futures(self, futures):
+        if not isinstance(futures, list):
+            return list()
+        return [x for x in futures if isinstance(x, dict)
+            and x.get('source', None) in self.mines
+            and x.get('target', None) in self.sites
+            and x.get('target', None) not in self.mines]
+
+    def play_turn(self):
+        message = {'move': {'moves': self.moves[-self.count:]}}
+        response = self._call(self.active, message) or self._pass(self.active)
+        return self.commit_move(self.active, response)
+
+    def commit_move(self, player_id, move):
+        try:
+            valid = self.validate_move(player_id, move)
+        except (AttributeError, KeyError, TypeError):
+            valid = self._pass(player_id)
+
+        if 'pass' in valid:
+            self.passes[player_id] += 1
+
+        elif 'claim' in valid:
+            self._claim(player_id, valid['claim'])
+
+        elif 'option' in valid:
+            self._option(player_id, valid['option'])
+
+        elif 'splurge' in valid:
+            for x in valid['splurge'].pop('moves'):
+                if 'claim' in x:
+                    self._claim(player_id, x['claim'])
+                else:
+                    self._option(player_id, x['option'])
+
+        self.moves.append(valid)
+        self.log.append(valid)
+
+        self.active = (self.active + 1) % self.count
+        self.turn += 1
+        return valid
+
+    def _claim(self, player_id, x):
+        river = river_key(x['source'], x['target'])
+        self.all_claims[river] = player_id
+        self.claims[player_id].append(river)
+
+    def _option(self, player_id, x):
+        river = river_key(x['source'], x['target'])
+        self.all_options[river] = player_id
+        self.options[player_id].append(river)
+
+    def validate_move(self, player_id, move):
+        res = self._pass(player_id)
+
+        claim = move.get('claim', None)
+        option = move.get('option', None)
+        splurge = move.get('splurge', None)
+
+        if claim:
+            river = river_key(claim.get('source', None), claim.get('target', None))
+            if river not in self.rivers or river in self.all_claims:
+                return res
+            return {'claim': {'punter': player_id, 'source': claim['source'], 'target': claim['target']}}
+
+        elif self.ext_options and option:
+            river = river_key(option.get('source', None), option.get('target', None))
+            if river not in self.rivers or river not in self.all_claims or river in self.all_options:
+                return res
+            if len(self.options[player_id]) >= len(self.mines):
+                return res
+            return {'option': {'punter': player_id, 'source': option['source'], 'target': option['target']}}
+
+        elif self.ext_splurges and splurge:
+            route = splurge.get('route', None)
+            if not isinstance(route, list) or len(route) < 2:
+                return res
+
+            # passes are never spent, as in server/punt/game.js
+            if self.passes[player_id] + 1 < len(route) - 1:
+                return res
+
+            options_left = len(self.mines) - len(self.options[player_id])
+            claimed = set()
+            optioned = set()
+            moves = list()
+
+            for source, target in zip(route, route[1:]):
+                river = river_key(source, target)
+                if river not in self.rivers or river in claimed:
+                    return res
+
+                if river in self.all_claims:
+                    if not self.ext_options or options_left <= 0:
+                        return res
+                    if river in self.all_options or river in optioned:
+                        return res
+                    options_left -= 1
+                    optioned.add(river)
+                    moves.append({'option': {'punter': player_id, 'source': source, 'target': target}})
+                else:
+                    claimed.add(river)
+                    moves.append({'claim': {'punter': player_id, 'source': source, 'target': target}})
+
+            return {'splurge': {'punter': player_id, 'route': route, 'moves': moves}}
+
+        return res
+
+    def _pass(self, player_id):
+        return {'pass': {'punter': player_id}}
+
+    def scores(self):
+        res = list()
+
+        for player_id in range(self.count):
+            rivers = list(self.claims[player_id])
+            if self.ext_options:
+                rivers.extend(self.options[player_id])
+
+            connected = map_distances(self.mines, rivers)
+            sites = set(x for river in rivers for x in river)
+
+            score = 0
+            for mine in self.mines:
+                for site in sites:
+                    if (mine, site) in connected:
+                        d = self.distances.get((mine, site), 0)
+                        score += d * d
+
+            if self.ext_futures:
+                for future in self.futures[player_id]:
+                    link = (future['source'], future['target'])
+                    d = self.distances.get(link, 0)
+                    if link in connected:
+                        score += d * d * d
+                    else:
+                        score -= d * d * d
+
+            res.append({'punter': player_id, 'score': score, 'name': self.names[player_id]})
+
+        return res
+
+    def stop(self):
+        scores = self.scores()
+        self.log.append({'stop': {'scores': scores}})
+
+        for _ in range(self.count):
+            message = {'stop': {'scores': scores, 'moves': self.moves[-self.count:]}}
+            self._call(self.active, message)
+            self.moves.append(self._pass(self.active))
+            self.active = (self.active + 1) % self.count
+
+        return scores
+
+    def run(self):
+        self.handshake()
+        self.setup()
+        while self.turn < self.turn_limit:
+            self.play_turn()
+        return self.stop()
+
+
+def replay(logfile, futures=None):
+    game = None
+    results = list()
+
+    for line in logfile:
+        try:
+            message = json.loads(line)
+        except ValueError:
+            continue
+
+        if 'map' in message:
+            settings = message.get('settings', None) or dict()
+            game = Game(message['map'], [None] * message['punters'],
+                futures=settings.get('futures', False),
+                options=settings.get('options', False),
+                splurges=settings.get('splurges', False))
+            mismatches = 0
+
+            # the server does not log futures, they come from the punters
+            if game.ext_futures and futures:
+                for i in range(game.count):
+                    game.futures[i] = game._validate_futures(futures.get(i, None) or futures.get(str(i), None))
+            continue
+
+        if game is None:
+            continue
+
+        if 'start' in message:
+            game.names = [x['name'] for x in message['start']]
+            continue
+
+        stop = message.get('stop', None)
+        if stop is not None:
+            expected = {x['punter']: x['score'] for x in stop.get('scores', list())}
+            actual = [x['score'] for x in game.scores()]
+            results.append((mismatches, [(i, expected.get(i, None), score) for i, score in enumerate(actual)]))
+            game = None
+            continue
+
+        kind = next(iter(message))
+        punter = message[kind]['punter']
+        valid = game.commit_move(punter, json.loads(line))
+        if valid != message:
+            mismatches += 1
+
+    return results
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Headless in-process game engine')
+
+    parser.add_argument('map', nargs='?', type=str,
+        help='map file')
+
+    parser.add_argument('-p', '--player', action='append', metavar='MODULE:CLASS',
+        help='player class, repeat for each seat, e.g. player:RandomMinesPlayer search:SearchPlayer')
+
+    parser.add_argument('-n', '--games', type=int, default=1,
+        help='number of games')
+
+    parser.add_argument('--futures', action='store_true',
+        help='enable futures')
+
+    parser.add_argument('--options', action='store_true',
+        help='enable options')
+
+    parser.add_argument('--splurges', action='store_true',
+        help='enable splurges')
+
+    parser.add_argument('--seed', type=int,
+        help='random seed')
+
+    parser.add_argument('--strict', action='store_true',
+        help='re-raise player exceptions instead of counting them as passes')
+
+    parser.add_argument('--log', type=argparse.FileType(mode='w'),
+        help='write a server-style log of the last game')
+
+    parser.add_argument('--replay', type=argparse.FileType(mode='r'),
+        help='replay a node server log, check moves and scores')
+
+    parser.add_argument('--replay-futures', type=argparse.FileType(mode='r'), metavar='FILE',
+        help='futures bid by each punter for --replay, JSON {punter: [{source, target}, ...]}')
+
+    args = parser.parse_args()
+
+    if args.replay is not None:
+        failed = False
+        futures = json.load(args.replay_futures) if args.replay_futures is not None else None
+        for game, (mismatches, scores) in enumerate(replay(args.replay, futures)):
+            failed = failed or mismatches > 0
+            print('game {}: {} move mismatches'.format(game, mismatches))
+            for punter, expected, actual in scores:
+                ok = expected == actual
+                failed = failed or not ok
+                print('game {} punter {}: server {} engine {}{}'.format(
+                    game, punter, expected, actual, '' if ok else '  MISMATCH'))
+        sys.exit(1 if failed else 0)
+
+    if args.map is None:
+        parser.error('map is required')
+
+    if args.seed is not None:
+        random.seed(args.seed)
+
+    with open(args.map, 'r') as fd:
+        game_map = json.load(fd)
+
+    specs = args.player or ['player:RandomMinesPlayer', 'player:RandomPlayer']
+
+    for n in range(args.games):
+        players = [load_player(spec) for spec in specs]
+        game = Game(game_map, players, futures=args.futures, options=args.options,
+            splurges=args.splurges, names=specs, strict=args.strict)
+
+        t = time.perf_counter()
+        scores = game.run()
+        elapsed = time.perf_counter() - t
+
+        print('game {}: {:.3f}s, {}'.format(n, elapsed,
+            ', '.join('{} {}'.format(x['name'], x['score']) for x in scores)))
+        if any(game.errors):
+            print('game {}: errors {}'.format(n, ', '.join('{} {}'.format(name, x)
+                for name, x in zip(game.names, game.errors))))
+
+        if args.log is not None and n == args.games - 1:
+            for x in game.log:
+                args.log.write(json.dumps(x) + '\n')
@@ -0,0 +1,90 @@
+import numpy as np
+
+from player import DistanceTable
+
+
+class BatchEvaluator:
+    def __init__(self, game_map, distances=None):
+        self.map = game_map
+
+        if distances is None:
+            distances = DistanceTable.build(game_map)
+
+        N = game_map.site_count
+        M = len(game_map.mines)
+        self.site_count = N
+        self.mine_count = M
+
+        d = np.frombuffer(distances.distances, dtype=np.uint16).astype(np.int64).reshape(M, N)
+        reachable = d != DistanceTable.UNREACHABLE
+        d = np.where(reachable, d, 0)
+
+        self.weights = (d * d).T.copy()
+        self.cubes = d * d * d
+
+        self.mines = np.frombuffer(game_map.mines, dtype=np.uint32).astype(np.intp)
+        self.sources = np.frombuffer(game_map.sources, dtype=np.uint32).astype(np.intp)
+        self.targets = np.frombuffer(game_map.targets, dtype=np.uint32).astype(np.intp)
+
+    def labels(self, board, player_id):
+        owned = np.frombuffer(board.owners, dtype=np.int16) == player_id
+        if board.options is not None:
+            owned |= np.frombuffer(board.options, dtype=np.int16) == player_id
+
+        xs = self.sources[owned]
+        ys = self.targets[owned]
+
+        labels = np.arange(self.site_count, dtype=np.intp)
+        if len(xs) == 0:
+            return labels
+
+        while True:
+            low = np.minimum(labels[xs], labels[ys])
+            update = labels.copy()
+            np.minimum.at(update, xs, low)
+            np.minimum.at(update, ys, low)
+            np.minimum.at(update, labels, update)
+            update = update[update]
+            if np.array_equal(update, labels):
+                return labels
+            labels = update
+
+    def evaluate(self, board, player_id, rivers, futures=None):
+        rivers = np.asarray(rivers, dtype=np.intp)
+        labels = self.labels(board, player_id)
+
+        N = self.site_count
+        M = self.mine_count
+
+        component_weights = np.empty((N, M), dtype=np.int64)
+        for i in range(M):
+            component_weights[:, i] = np.bincount(labels, weights=self.weights[:, i], minlength=N)
+
+        component_mines = np.zeros((N, M), dtype=bool)
+        component_mines[labels[self.mines], np.arange(M)] = True
+
+        cx = labels[self.sources[rivers]]
+        cy = labels[self.targets[rivers]]
+
+        delta = ((component_mines[cx] * component_weights[cy]).sum(axis=1)
+            + (component_mines[cy] * component_weights[cx]).sum(axis=1))
+
+        if futures:
+            futures = np.asarray(futures, dtype=np.intp).reshape(-1, 2)
+            fm = futures[:, 0]
+            ft = futures[:, 1]
+
+            lm = labels[self.mines[fm]]
+            lt = labels[ft]
+            w = self.cubes[fm, ft]
+
+            joins = (((cx[:, None] == lm) & (cy[:, None] == lt))
+                | ((cy[:, None] == lm) & (cx[:, None] == lt)))
+            delta += 2 * (joins * w).sum(axis=1)
+
+        delta[cx == cy] = 0
+        return delta
+
+
+def evaluate(board, player_id, rivers, distances=None, futures=None):
+    return BatchEvaluator(board.map, distances).evaluate(board, player_id, rivers, futures=futures)
@@ -0,0 +1,227 @@
+# The pool lives as long as the process: host ParallelSearchPlayer in a long-lived
+# process, e.g. engine.py -p parallel:ParallelSearchPlayer or online.py --player.
+# Offline clients run one process per move and would fork a pool every turn,
+# so there is no offline entry point.
+
+import atexit
+import multiprocessing
+import os
+import random
+import sys
+import time
+
+from array import array
+
+try:
+    from multiprocessing import resource_tracker, shared_memory
+except ImportError:
+    # Python < 3.8
+    shared_memory = None
+
+from player import DEBUG, DistanceTable, PunterBoard, PunterMap
+from scorer import Scorer
+from search import SEARCH_DEPTH, SEARCH_VERBOSE, PlayoutSearch, SearchPlayer, SearchStats
+
+
+PARALLEL_WORKERS=int(os.environ.get('PUNTER_WORKERS', 0)) or os.cpu_count() or 1
+
+
+class SharedTables:
+    HEADER = len(PunterMap.COLUMNS) + 1
+
+    def __init__(self, shm, game_map, distances, views):
+        self.shm = shm
+        self.map = game_map
+        self.distances = distances
+        self.views = views
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    @classmethod
+    def create(cls, game_map, distances):
+        columns = [getattr(game_map, name) for name in PunterMap.COLUMNS]
+        header = array('I', [len(x) for x in columns] + [len(distances.distances)])
+
+        size = (len(header) + sum(len(x) for x in columns)) * 4 + len(distances.distances) * 2
+        shm = shared_memory.SharedMemory(create=True, size=max(1, size))
+
+        offset = 0
+        for x in [header] + columns + [distances.distances]:
+            data = memoryview(x).cast('B')
+            shm.buf[offset:offset + len(data)] = data
+            offset += len(data)
+            data.release()
+
+        return cls(shm, game_map, distances, list())
+
+    @classmethod
+    def attach(cls, name):
+        shm = shared_memory.SharedMemory(name=name)
+        views = list()
+
+        def view(offset, count, typecode, width):
+            x = shm.buf[offset:offset + count * width]
+            views.append(x)
+            x = x.cast(typecode)
+            views.append(x)
+            return x, offset + count * width
+
+        header, offset = view(0, cls.HEADER, 'I', 4)
+        sizes = list(header)
+
+        game_map = PunterMap.__new__(PunterMap)
+        for name, count in zip(PunterMap.COLUMNS, sizes):
+            column, offset = view(offset, count, 'I', 4)
+            setattr(game_map, name, column)
+
+        table, offset = view(offset, sizes[-1], 'H', 2)
+        return cls(shm, game_map, DistanceTable(game_map, table), views)
+
+    def close(self):
+        self.map = None
+        self.distances = None
+        for x in reversed(self.views):
+            x.release()
+        self.views = list()
+        self.shm.close()
+
+    def unlink(self):
+        self.close()
+        self.shm.unlink()
+
+
+_worker_tables = dict()
+
+
+def _attach(name):
+    tables = _worker_tables.get(name, None)
+    if tables is None:
+        for x in _worker_tables.values():
+            x.close()
+        _worker_tables.clear()
+        tables = SharedTables.attach(name)
+        _worker_tables[name] = tables
+    return tables
+
+
+def _playouts(task):
+    name, players, player_id, owners, options, candidates, depth, budget, seed = task
+    deadline = time.perf_counter() + budget
+
+    random.seed(seed)
+    tables = _attach(name)
+
+    board = PunterBoard(tables.map, owners, options)
+    scorer = Scorer.from_board(board, tables.distances, players)
+
+    engine = PlayoutSearch(board, scorer, player_id, players, depth=depth, candidates=candidates)
+    engine.run(deadline)
+
+    return engine.visits, engine.totals, engine.iterations
+
+
+class PlayoutPool:
+    MARGIN = 0.01
+    GRACE = 0.05
+
+    def __init__(self, workers=PARALLEL_WORKERS):
+        self.workers = workers
+        resource_tracker.ensure_running()
+        self.pool = multiprocessing.Pool(workers)
+        self.tables = None
+        self.key = None
+
+    def load(self, key, game_map, distances):
+        if self.key != key:
+            if self.tables is not None:
+                self.tables.unlink()
+            self.tables = SharedTables.create(game_map, distances)
+            self.key = key
+
+    def search(self, board, scorer, player_id, players, deadline, depth=SEARCH_DEPTH):
+        started = time.perf_counter()
+
+        engine = PlayoutSearch(board, scorer, player_id, players, depth=depth)
+        candidates = engine.candidates
+        if len(candidates) == 0:
+            return None, None
+
+        budget = max(0, deadline - started - self.MARGIN)
+        tasks = [(self.tables.name, players, player_id, board.owners, board.options,
+            candidates, depth, budget, random.getrandbits(32)) for _ in range(self.workers)]
+        results = [self.pool.apply_async(_playouts, (task,)) for task in tasks]
+
+        visits = [0] * len(candidates)
+        totals = [0] * len(candidates)
+        iterations = 0
+
+        for result in results:
+            try:
+                x = result.get(timeout=max(0, deadline - time.perf_counter()) + self.GRACE)
+            except multiprocessing.TimeoutError:
+                continue
+            for i, (n, total) in enumerate(zip(*x[:2])):
+                visits[i] += n
+                totals[i] += total
+            iterations += x[2]
+
+        visited = [i for i, n in enumerate(visits) if n > 0]
+        if len(visited) > 0:
+            best = max(visited, key=lambda i: totals[i] / visits[i])
+        else:
+            best = engine.greedy()[0]
+
+        stats = SearchStats(iterations, time.perf_counter() - started, len(candidates), visits[best])
+        return candidates[best], stats
+
+    def close(self):
+        self.pool.terminate()
+        self.pool.join()
+        if self.tables is not None:
+            self.tables.unlink()
+            self.tables = None
+
+
+_pools = dict()
+
+
+def playout_pool(workers=PARALLEL_WORKERS):
+    pool = _pools.get(workers, None)
+    if pool is None:
+        pool = PlayoutPool(workers)
+        _pools[workers] = pool
+    return pool
+
+
+@atexit.register
+def _close_pools():
+    for pool in _pools.values():
+        pool.close()
+    _pools.clear()
+
+
+class ParallelSearchPlayer(SearchPlayer):
+    def __init__(self, workers=PARALLEL_WORKERS, budget=None, depth=SEARCH_DEPTH):
+        super().__init__(budget=budget, depth=depth)
+        if DEBUG:
+            self.name = 'paiv-parallel'
+        self.workers = workers
+
+    def make_claim(self):
+        if shared_memory is None:
+            return super().make_claim()
+
+        pool = playout_pool(self.workers)
+        pool.load(self.map_hash, self.map, self.distances)
+
+        river, stats = pool.search(self.board, self.scorer, self.player_id, self.players,
+            self.deadline(), depth=self.depth)
+
+        if stats is not None:
+            self.search_stats = stats
+            if SEARCH_VERBOSE:
+                print(stats, file=sys.stderr)
+
+        return river
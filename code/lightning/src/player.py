@@ -1,19 +1,43 @@
 #!/usr/bin/env python3 -u
+import base64
+import hashlib
 import io
 import json
+import mmap
 import os
 import random
+import struct
 import sys
+import time
+import zlib
 
+from array import array
+from bisect import bisect_left
 from datetime import datetime
 from collections import OrderedDict
+from scorer import Scorer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 
 DEBUG=False
 
+MAP_CACHE=os.environ.get('PUNTER_MAP_CACHE', None)
+
+STATE_CODEC=os.environ.get('PUNTER_STATE_CODEC', 'zlib')
+
+JSON_BACKEND=os.environ.get('PUNTER_JSON', None)
+
+MOVE_TIMEOUT=float(os.environ.get('PUNTER_MOVE_TIMEOUT', 1.0))
+
+PHASE_METRICS=os.environ.get('PUNTER_METRICS', None)
+
 
 class Logger:
-    def __init__(self, fn=None, overwrite=False):
+    def __init__(self, fn=None, overwrite=False, codec=None):
         if fn is None:
             now = datetime.now().strftime('%Y%m%d%H%M%S')
             fn = 'logs/%s.log' % now
@@ -21,6 +45,7 @@ class Logger:
                 os.makedirs('logs', exist_ok=True)
 
         self.file_name = fn
+        self.codec = codec
 
         if DEBUG:
             mode = 'w' if overwrite else 'a'
@@ -33,10 +58,76 @@ class Logger:
                 self.file.write(str(arg))
             self.file.write('\n')
 
+    def log_json(self, obj):
+        if DEBUG:
+            codec = self.codec or json_codec()
+            self.log(str(codec.dumps(obj), 'utf-8'))
+
 
 # logger = Logger('offline_player.log', overwrite=True)
 
 
+class PhaseMetrics:
+    BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000)
+
+    def __init__(self, sink=None):
+        self.sink = sink
+        self.histograms = dict()
+        self.turn = dict()
+
+    def measure(self, name, fn, *args):
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        try:
+            return fn(*args)
+        finally:
+            self.add(name, (time.perf_counter() - wall) * 1000, (time.process_time() - cpu) * 1000)
+
+    def add(self, name, wall_ms, cpu_ms):
+        self.turn[name] = {'wall_ms': round(wall_ms, 3), 'cpu_ms': round(cpu_ms, 3)}
+
+        h = self.histograms.get(name, None)
+        if h is None:
+            n = len(self.BUCKETS) + 1
+            h = {'count': 0, 'wall_total': 0, 'cpu_total': 0, 'wall': [0] * n, 'cpu': [0] * n}
+            self.histograms[name] = h
+
+        h['count'] += 1
+        h['wall_total'] = round(h['wall_total'] + wall_ms, 3)
+        h['cpu_total'] = round(h['cpu_total'] + cpu_ms, 3)
+        h['wall'][bisect_left(self.BUCKETS, wall_ms)] += 1
+        h['cpu'][bisect_left(self.BUCKETS, cpu_ms)] += 1
+
+    def percentile(self, name, p, kind='wall'):
+        h = self.histograms[name]
+        rank = p / 100 * h['count']
+        seen = 0
+        for i, n in enumerate(h[kind]):
+            seen += n
+            if seen >= rank and n > 0:
+                return self.BUCKETS[i] if i < len(self.BUCKETS) else float('inf')
+
+    def emit_turn(self, **fields):
+        if len(self.turn) > 0:
+            fields['phases'] = self.turn
+            self._write(fields)
+            self.turn = dict()
+
+    def emit_histograms(self, **fields):
+        fields['buckets_ms'] = self.BUCKETS
+        fields['histograms'] = self.histograms
+        self._write(fields)
+
+    def _write(self, obj):
+        line = json.dumps(obj) + '\n'
+        if self.sink in (None, '-', 'stderr'):
+            sys.stderr.write(line)
+            sys.stderr.flush()
+        else:
+            with open(self.sink, 'a') as fd:
+                fd.write(line)
+
+
 class PunterError(Exception):
     pass
 
@@ -45,54 +136,124 @@ class PunterTransportError(PunterError):
     pass
 
 
-class PunterTransport:
-    def send(self, obj):
-        packet = json.dumps(obj, separators=(',', ':'))
-        packet = bytes(packet, 'utf-8')
-        header = bytes('%d:' % len(packet), 'ascii')
-        self.write(header)
-        self.write(packet)
+class PunterStateError(PunterError):
+    pass
 
-    def receive(self):
-        # s,_,_ = select.select([self.socket], [], [], 10)
 
-        chunks = []
+class JsonCodec:
+    def __init__(self, ordered=False):
+        self.object_pairs_hook = OrderedDict if ordered else None
 
-        total = 20
-        body = ''
+    def dumps(self, obj):
+        return bytes(json.dumps(obj, separators=(',', ':')), 'utf-8')
 
-        while True:
-            chunk = self.read(1)
-            if chunk == b'':
+    def loads(self, data):
+        return json.loads(data, object_pairs_hook=self.object_pairs_hook)
+
+
+class OrjsonCodec:
+    def dumps(self, obj):
+        return orjson.dumps(obj)
+
+    def loads(self, data):
+        return orjson.loads(data)
+
+
+JSON_CODECS = {
+    'json': JsonCodec,
+    'json-ordered': lambda: JsonCodec(ordered=True),
+}
+
+if orjson is not None:
+    JSON_CODECS['orjson'] = OrjsonCodec
+
+
+def json_codec(name=None):
+    name = name or JSON_BACKEND
+    if name not in JSON_CODECS:
+        name = 'orjson' if orjson is not None else 'json'
+    return JSON_CODECS[name]()
+
+
+class PunterFrameReader:
+    CHUNK_SIZE = 65536
+    MAX_HEADER = 20
+
+    def __init__(self, transport):
+        self.transport = transport
+        self.buffer = bytearray()
+
+    def read_frame(self):
+        offset = self._read_header()
+        size = int(self.buffer[:offset])
+        start = offset + 1
+
+        if len(self.buffer) - start >= size:
+            body = self.buffer[start:start + size]
+            del self.buffer[:start + size]
+            return body
+
+        body = bytearray(size)
+        view = memoryview(body)
+
+        pos = len(self.buffer) - start
+        view[:pos] = self.buffer[start:]
+        self.buffer.clear()
+
+        while pos < size:
+            n = self.transport.readinto(view[pos:])
+            if n == 0:
                 raise PunterTransportError()
+            if n is not None:
+                pos += n
 
-            if chunk is not None:
-                chunks.append(chunk)
+        return body
 
-            data = str(b''.join(chunks), 'utf-8')
-            parts = data.split(':', 1)
-            if len(parts) == 2:
-                body = parts[1]
-                total = int(parts[0]) - len(body)
-                break
+    def _read_header(self):
+        offset = self.buffer.find(b':')
 
-        chunks = []
-        body_size = total
+        while offset < 0:
+            if len(self.buffer) > self.MAX_HEADER:
+                raise PunterTransportError('invalid frame header')
 
-        while total > 0:
-            chunk = self.read(total)
+            chunk = self.transport.read(self.CHUNK_SIZE)
             if chunk == b'':
                 raise PunterTransportError()
 
             if chunk is not None:
-                chunks.append(chunk)
-                total -= len(chunk)
+                self.buffer += chunk
+                offset = self.buffer.find(b':')
 
-        response = b''.join(chunks)
-        response = body + str(response, 'utf-8')
-        response = json.loads(response, object_pairs_hook=OrderedDict)
+        return offset
+
+
+class PunterTransport:
+    def __init__(self, codec=None):
+        self.reader = PunterFrameReader(self)
+        self.codec = codec or json_codec()
+
+    def send(self, obj):
+        packet = self.codec.dumps(obj)
+        header = bytes('%d:' % len(packet), 'ascii')
+        self.writev([header, packet])
+
+    def writev(self, buffers):
+        self.write(b''.join(buffers))
+
+    def receive(self):
+        # s,_,_ = select.select([self.socket], [], [], 10)
+
+        body = self.reader.read_frame()
+        response = self.codec.loads(body)
         return response
 
+    def readinto(self, view):
+        chunk = self.read(len(view))
+        if chunk:
+            view[:len(chunk)] = chunk
+            return len(chunk)
+        return None if chunk is None else 0
+
     def close(self):
         pass
 
@@ -115,6 +276,9 @@ class PunterFileTransport(PunterTransport):
     def read(self, n):
         return self.rfile.read(n)
 
+    def readinto(self, view):
+        return self.rfile.readinto(view)
+
 
 class PunterFilenoTransport(PunterFileTransport):
     def __init__(self, rfd, wfd):
@@ -123,6 +287,21 @@ class PunterFilenoTransport(PunterFileTransport):
         self.samefds = rfd == wfd
         super().__init__(self.rfile, self.wfile)
 
+    def writev(self, buffers):
+        if not hasattr(os, 'writev'):
+            return super().writev(buffers)
+
+        fd = self.wfile.fileno()
+        views = [memoryview(x) for x in buffers]
+
+        while len(views) > 0:
+            n = os.writev(fd, views)
+            while len(views) > 0 and n >= len(views[0]):
+                n -= len(views[0])
+                views.pop(0)
+            if n > 0:
+                views[0] = views[0][n:]
+
     def close(self):
         self.rfile.close()
         if not self.samefds:
@@ -133,6 +312,398 @@ class PunterStdioTransport(PunterFileTransport):
     def __init__(self):
         super().__init__(sys.stdin.buffer, sys.stdout.buffer)
 
+    def read(self, n):
+        return self.rfile.read1(n)
+
+
+class PunterMap:
+    COLUMNS = ('sites', 'mines', 'sources', 'targets', 'offsets', 'adjacency')
+
+    def __init__(self, sites=None, mines=None, sources=None, targets=None, offsets=None, adjacency=None):
+        self.sites = array('I', sites or [])
+        self.mines = array('I', mines or [])
+        self.sources = array('I', sources or [])
+        self.targets = array('I', targets or [])
+        self.offsets = array('I', offsets or [])
+        self.adjacency = array('I', adjacency or [])
+
+        if offsets is None:
+            self._build_index()
+
+    @classmethod
+    def from_protocol(cls, obj):
+        sites = sorted(set(x['id'] for x in obj.get('sites', list())))
+        index = {site: i for i, site in enumerate(sites)}
+
+        rivers = set()
+        for river in obj.get('rivers', list()):
+            x, y = index[river['source']], index[river['target']]
+            rivers.add((x, y) if x < y else (y, x))
+        rivers = sorted(rivers)
+
+        mines = sorted(set(index[x] for x in obj.get('mines', list()) if x in index))
+
+        return cls(sites=sites, mines=mines,
+            sources=[x for x,_ in rivers],
+            targets=[y for _,y in rivers])
+
+    def _build_index(self):
+        N = len(self.sites)
+        degree = [0] * (N + 1)
+        for x, y in zip(self.sources, self.targets):
+            degree[x + 1] += 1
+            degree[y + 1] += 1
+
+        for i in range(N):
+            degree[i + 1] += degree[i]
+        self.offsets = array('I', degree)
+
+        fill = degree[:-1]
+        adjacency = [0] * degree[-1]
+        for river, (x, y) in enumerate(zip(self.sources, self.targets)):
+            adjacency[fill[x]] = river
+            fill[x] += 1
+            adjacency[fill[y]] = river
+            fill[y] += 1
+        self.adjacency = array('I', adjacency)
+
+    def to_state(self):
+        return {name: getattr(self, name) for name in self.COLUMNS}
+
+    @classmethod
+    def from_state(cls, obj):
+        if not obj:
+            return cls()
+        return cls(**obj)
+
+    def to_file(self, fd):
+        columns = [getattr(self, name) for name in self.COLUMNS]
+        array('I', (len(x) for x in columns)).tofile(fd)
+        for x in columns:
+            x.tofile(fd)
+
+    @classmethod
+    def from_file(cls, fd):
+        sizes = array('I')
+        sizes.fromfile(fd, len(cls.COLUMNS))
+
+        game_map = cls.__new__(cls)
+        for name, size in zip(cls.COLUMNS, sizes):
+            x = array('I')
+            x.fromfile(fd, size)
+            setattr(game_map, name, x)
+        return game_map
+
+    def digest(self):
+        h = hashlib.sha1()
+        for name in ('sites', 'mines', 'sources', 'targets'):
+            x = getattr(self, name)
+            h.update(bytes('%s:%d:' % (name, len(x)), 'ascii'))
+            h.update(x.tobytes())
+        return h.hexdigest()
+
+    @property
+    def site_count(self):
+        return len(self.sites)
+
+    @property
+    def river_count(self):
+        return len(self.sources)
+
+    def site_index(self, site_id):
+        i = bisect_left(self.sites, site_id)
+        if i < len(self.sites) and self.sites[i] == site_id:
+            return i
+
+    def rivers_from(self, site):
+        return self.adjacency[self.offsets[site]:self.offsets[site + 1]]
+
+    def river_sites(self, river):
+        return self.sources[river], self.targets[river]
+
+    def other_site(self, river, site):
+        x = self.sources[river]
+        return self.targets[river] if x == site else x
+
+    def river_between(self, x, y):
+        if self.offsets[x + 1] - self.offsets[x] > self.offsets[y + 1] - self.offsets[y]:
+            x, y = y, x
+        for river in self.rivers_from(x):
+            if self.other_site(river, x) == y:
+                return river
+
+    def river_id(self, source, target):
+        x = self.site_index(source)
+        y = self.site_index(target)
+        if x is not None and y is not None:
+            return self.river_between(x, y)
+
+    def river_ids(self, river):
+        return self.sites[self.sources[river]], self.sites[self.targets[river]]
+
+
+class DistanceTable:
+    UNREACHABLE = 0xffff
+
+    def __init__(self, game_map, distances):
+        self.map = game_map
+        self.distances = distances
+        self.sites = game_map.site_count
+
+    @classmethod
+    def build(cls, game_map):
+        N = game_map.site_count
+        distances = array('H', [cls.UNREACHABLE]) * (len(game_map.mines) * N)
+
+        for i, mine in enumerate(game_map.mines):
+            cls._bfs(game_map, mine, distances, i * N)
+
+        return cls(game_map, distances)
+
+    @staticmethod
+    def _bfs(game_map, source, distances, base):
+        sources = game_map.sources
+        targets = game_map.targets
+        offsets = game_map.offsets
+        adjacency = game_map.adjacency
+
+        distances[base + source] = 0
+        queue = [source]
+
+        for site in queue:
+            d = distances[base + site] + 1
+            for river in adjacency[offsets[site]:offsets[site + 1]]:
+                x = sources[river]
+                if x == site:
+                    x = targets[river]
+                if distances[base + x] > d:
+                    distances[base + x] = d
+                    queue.append(x)
+
+    def distance(self, mine_index, site):
+        return self.distances[mine_index * self.sites + site]
+
+    def mine_row(self, mine_index):
+        start = mine_index * self.sites
+        return self.distances[start:start + self.sites]
+
+
+class MapCache:
+    def __init__(self, path):
+        self.path = path
+
+    def _file_name(self, key, ext='map'):
+        return os.path.join(self.path, '%s.%s' % (key, ext))
+
+    def load(self, key):
+        try:
+            with open(self._file_name(key), 'rb') as fd:
+                return PunterMap.from_file(fd)
+        except (OSError, EOFError):
+            return None
+
+    def store(self, key, game_map):
+        return self._store(self._file_name(key), game_map.to_file)
+
+    def load_distances(self, key, game_map):
+        try:
+            with open(self._file_name(key, 'dist'), 'rb') as fd:
+                data = mmap.mmap(fd.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return None
+
+        view = memoryview(data)
+        try:
+            distances = view.cast('H')
+        except TypeError:
+            # truncated to an odd length, rebuild the table
+            view.release()
+            data.close()
+            return None
+
+        if len(distances) != len(game_map.mines) * game_map.site_count:
+            distances.release()
+            view.release()
+            data.close()
+            return None
+        return DistanceTable(game_map, distances)
+
+    def store_distances(self, key, table):
+        return self._store(self._file_name(key, 'dist'), table.distances.tofile)
+
+    def _store(self, fn, write):
+        temp = '%s.%d.tmp' % (fn, os.getpid())
+        try:
+            os.makedirs(self.path, exist_ok=True)
+            with open(temp, 'wb') as fd:
+                write(fd)
+            os.replace(temp, fn)
+            return True
+        except OSError:
+            return False
+
+
+class JsonStateCodec:
+    def encode(self, state):
+        return self._encode(state)
+
+    def _encode(self, value):
+        if isinstance(value, array):
+            return value.tolist()
+        if isinstance(value, dict):
+            return {k: self._encode(v) for k, v in value.items()}
+        return value
+
+    def decode(self, obj):
+        return obj or dict()
+
+
+class ZlibStateCodec:
+    def __init__(self, level=1):
+        self.level = level
+
+    def encode(self, state):
+        blobs = []
+        header = self._pack(state, blobs)
+        header = bytes(json.dumps(header, separators=(',', ':')), 'utf-8')
+
+        payload = b''.join([struct.pack('<I', len(header)), header] + blobs)
+        payload = zlib.compress(payload, self.level)
+        return str(base64.b64encode(payload), 'ascii')
+
+    def _pack(self, value, blobs):
+        if isinstance(value, array):
+            blobs.append(value.tobytes())
+            return {'$array': value.typecode, 'size': len(value)}
+        if isinstance(value, dict):
+            return {k: self._pack(v, blobs) for k, v in value.items()}
+        return value
+
+    def decode(self, obj):
+        if not obj:
+            return dict()
+        if isinstance(obj, dict):
+            return obj
+
+        payload = zlib.decompress(base64.b64decode(obj))
+        size, = struct.unpack_from('<I', payload)
+        header = json.loads(str(payload[4:4 + size], 'utf-8'))
+
+        view = memoryview(payload)[4 + size:]
+        state, _ = self._unpack(header, view)
+        return state
+
+    def _unpack(self, value, view):
+        if isinstance(value, dict):
+            typecode = value.get('$array', None)
+            if typecode is not None:
+                x = array(typecode)
+                size = value['size'] * x.itemsize
+                x.frombytes(view[:size])
+                return x, view[size:]
+
+            res = dict()
+            for k, v in value.items():
+                res[k], view = self._unpack(v, view)
+            return res, view
+        return value, view
+
+
+STATE_CODECS = {
+    'json': JsonStateCodec,
+    'zlib': ZlibStateCodec,
+}
+
+
+class PunterBoard:
+    FREE = -1
+
+    def __init__(self, game_map, owners=None, options=None, keys=None, key=None):
+        self.map = game_map
+        if owners is None:
+            owners = [self.FREE] * game_map.river_count
+        self.owners = array('h', owners)
+        self.options = array('h', options) if options is not None else None
+
+        # running zobrist key, kept up to date by claim and option
+        self.keys = keys
+        self.key = 0
+        if keys is not None:
+            self.key = key if key is not None else keys.hash(self)
+
+    def enable_options(self):
+        if self.options is None:
+            self.options = array('h', [self.FREE]) * self.map.river_count
+
+    def claim(self, river, player_id):
+        if self.keys is not None:
+            owner = self.owners[river]
+            if owner >= 0:
+                self.key ^= self.keys.claim(river, owner)
+            if player_id >= 0:
+                self.key ^= self.keys.claim(river, player_id)
+        self.owners[river] = player_id
+
+    def option(self, river, player_id):
+        self.enable_options()
+        if self.keys is not None:
+            owner = self.options[river]
+            if owner >= 0:
+                self.key ^= self.keys.option(river, owner)
+            if player_id >= 0:
+                self.key ^= self.keys.option(river, player_id)
+        self.options[river] = player_id
+
+    def owner(self, river):
+        return self.owners[river]
+
+    def option_owner(self, river):
+        return self.options[river] if self.options is not None else self.FREE
+
+    def is_free(self, river):
+        return self.owners[river] == self.FREE
+
+    def free_rivers(self):
+        return [river for river, owner in enumerate(self.owners) if owner == self.FREE]
+
+    def rivers_of(self, player_id):
+        return [river for river, owner in enumerate(self.owners) if owner == player_id]
+
+    def apply(self, move):
+        claim = move.get('claim', None)
+        option = move.get('option', None)
+        splurge = move.get('splurge', None)
+
+        res = list()
+
+        if claim is not None:
+            river = self.map.river_id(claim['source'], claim['target'])
+            if river is not None:
+                self.claim(river, claim['punter'])
+                res.append(('claim', river, claim['punter']))
+
+        elif option is not None:
+            river = self.map.river_id(option['source'], option['target'])
+            if river is not None:
+                self.option(river, option['punter'])
+                res.append(('option', river, option['punter']))
+
+        elif splurge is not None:
+            punter = splurge['punter']
+            route = splurge.get('route', None) or list()
+            for source, target in zip(route, route[1:]):
+                river = self.map.river_id(source, target)
+                if river is None:
+                    continue
+                if self.is_free(river):
+                    self.claim(river, punter)
+                    res.append(('claim', river, punter))
+                else:
+                    self.option(river, punter)
+                    res.append(('option', river, punter))
+
+        return res
+
 
 class PunterPlayer:
     STATE_HANDSHAKE = 0
@@ -144,105 +715,216 @@ class PunterPlayer:
         super().__init__()
         self.name = 'paiv'
         self.state = self.STATE_HANDSHAKE
+        self.map_cache = MapCache(MAP_CACHE) if MAP_CACHE else None
+        self.map_cached = False
+        self.state_codec = STATE_CODECS[STATE_CODEC]()
+        self._distances = None
+        self._scorer = None
+        self.timeout = MOVE_TIMEOUT
+        self.timeouts = 0
+        self.started = None
+        self.metrics = PhaseMetrics(PHASE_METRICS) if PHASE_METRICS else None
 
     def handshake(self, response=None):
         if response is None:
             return self._api_me()
+        elif self.state == self.STATE_HANDSHAKE:
+            self.state = self.STATE_SETUP
+
+    def _measure(self, name, fn, *args):
+        if self.metrics is None:
+            return fn(*args)
+        return self.metrics.measure(name, fn, *args)
+
+    def _emit_metrics(self):
+        if self.metrics is not None:
+            self.metrics.emit_turn(punter=self.player_id, state=self.state)
 
     def move(self, game):
-        self._unpack_state(game)
+        started = time.perf_counter()
+        self._measure('unpack', self._unpack_state, game)
 
         self.logger = Logger(self.logfile)
         self.logfile = self.logger.file_name
 
         self.logger.log('> received')
-        self.logger.log(json.dumps(game))
+        self.logger.log_json(game)
 
-        response = OrderedDict()
-
-        if self.state == self.STATE_SETUP:
-            response = self.setup(game)
-        elif self.state == self.STATE_GAMEPLAY:
-            response = self.gameplay(game)
+        response = self.play(game, started=started)
 
         if response is not None:
-            response = self._pack_state(response)
+            response = self._measure('pack', self._pack_state, response)
 
             self.logger.log('< response')
-            self.logger.log(json.dumps(response))
-            return response
+            self.logger.log_json(response)
+
+        self._emit_metrics()
+        return response
+
+    def play(self, game, started=None):
+        self.started = started if started is not None else time.perf_counter()
+
+        timeout = game.get('timeout', None)
+        if timeout is not None:
+            self.timeout = timeout
+            self.timeouts += 1
+            if 'move' not in game and 'stop' not in game:
+                return None
 
-    def _unpack_state(self, game):
         move = game.get('move', None) or dict()
         self.last_moves = move.get('moves', None) or []
 
-        self.player_state = game.get('state', None) or dict()
+        if self.state == self.STATE_SETUP:
+            response = self._measure('setup', self.setup, game)
+        elif self.state == self.STATE_GAMEPLAY:
+            response = self.gameplay(game)
+        else:
+            response = None
+
+        if started is None:
+            self._emit_metrics()
+        return response
+
+    def _unpack_state(self, game):
+        self.player_state = self.state_codec.decode(game.get('state', None))
         x = self.player_state
 
         self.logfile = x.get('logfile', None)
         self.state = x.get('state', None) or self.STATE_SETUP
         self.player_id = x.get('player_id', None)
         self.players = x.get('players', 0)
-        self.map = x.get('map', None) or dict()
-        self.map['rivers'] = [tuple(sorted((r[0], r[1]))) for r in self.map.get('rivers', list())]
-
-        claims = x.get('claims', list())
-        self.claims = set(tuple(sorted((r[0], r[1]))) for r in claims)
-
-        my_claims = x.get('my_claims', list())
-        self.my_claims = set(tuple(sorted((r[0], r[1]))) for r in my_claims)
+        self.settings = x.get('settings', None) or dict()
+        self.map_hash = x.get('map_hash', None)
+        self.timeout = x.get('timeout', MOVE_TIMEOUT)
+        self.timeouts = x.get('timeouts', 0)
+        self.map_cached = False
+        self.map = self._unpack_map(x)
+        self.board = PunterBoard(self.map, x.get('owners', None), x.get('options', None),
+            self._board_keys(), x.get('zobrist', None))
+        self._distances = None
+        self._scorer = None
+
+    def _unpack_map(self, x):
+        if self.map_hash is not None and self.map_cache is not None:
+            game_map = self.map_cache.load(self.map_hash)
+            if game_map is not None:
+                self.map_cached = True
+                return game_map
+
+        game_map = x.get('map', None)
+        if game_map is not None:
+            game_map = PunterMap.from_state(game_map)
+            if self.map_hash is not None and self.map_cache is not None:
+                self.map_cached = self.map_cache.store(self.map_hash, game_map)
+            return game_map
+
+        if self.map_hash is not None:
+            raise PunterStateError('map %s is not cached' % self.map_hash)
+
+        return PunterMap()
+
+    def _board_keys(self):
+        return None
 
     def _pack_state(self, response):
-        response = OrderedDict(response)
+        response = dict(response)
         x = self.player_state
         if DEBUG:
             x['logfile'] = self.logfile
         x['state'] = self.state
         x['player_id'] = self.player_id
         x['players'] = self.players
-        x['map'] = self.map
-        x['claims'] = list(self.claims)
-        x['my_claims'] = list(self.my_claims)
-        response['state'] = x
+        x['settings'] = self.settings
+        x['map_hash'] = self.map_hash
+        x['timeout'] = self.timeout
+        x['timeouts'] = self.timeouts
+        # the inline map only travels when the cache could not keep it
+        if self.map_cached:
+            x.pop('map', None)
+        elif 'map' not in x:
+            x['map'] = self.map.to_state()
+        x['owners'] = self.board.owners
+        if self.board.options is not None:
+            x['options'] = self.board.options
+        if self.board.keys is not None:
+            x['zobrist'] = self.board.key
+        response['state'] = self.state_codec.encode(x)
         return response
 
     def setup(self, request):
         self.player_id = request.get('punter', None)
-        self.map = request.get('map', None)
+        self.settings = request.get('settings', None) or dict()
+        self.map = PunterMap.from_protocol(request.get('map', None) or dict())
+        self.map_hash = self.map.digest()
+        self.players = request.get('punters', None)
 
-        if self.map is not None:
-            rivers = self.map.get('rivers', list())
-            rivers = [tuple(sorted((r['source'], r['target']))) for r in rivers]
-            self.map['rivers'] = rivers
+        self.board = PunterBoard(self.map, keys=self._board_keys())
+        if self.settings.get('options', False):
+            self.board.enable_options()
 
-            sites = self.map.pop('sites', list())
-            sites = [x['id'] for x in sites]
-            self.map['sites'] = sites
+        self._distances = None
+        self._scorer = None
+        self.map_cached = False
+        if self.map_cache is not None:
+            self.map_cached = self.map_cache.store(self.map_hash, self.map)
 
-        self.players = request.get('punters', None)
         self.state = self.STATE_GAMEPLAY
         self.extra_setup()
         return self._api_ready()
 
+    @property
+    def distances(self):
+        if self._distances is None:
+            self._distances = self._load_distances()
+        return self._distances
+
+    def _load_distances(self):
+        cache = self.map_cache if len(self.map.mines) > 0 else None
+
+        if cache is not None:
+            table = cache.load_distances(self.map_hash, self.map)
+            if table is not None:
+                return table
+
+        table = DistanceTable.build(self.map)
+
+        if cache is not None:
+            cache.store_distances(self.map_hash, table)
+
+        return table
+
+    @property
+    def scorer(self):
+        if self._scorer is None:
+            self._scorer = Scorer.from_board(self.board, self.distances, self.players)
+        return self._scorer
+
     def extra_setup(self):
         pass
 
     def gameplay(self, request):
         if request.get('stop', None) is not None:
             self.state = self.STATE_SCORING
+            if self.metrics is not None:
+                self.metrics.emit_histograms(punter=self.player_id)
         else:
             return self.make_move()
 
     def make_move(self):
-        self.process_moves()
-        river = self.make_claim()
+        self._measure('process_moves', self.process_moves)
+        river = self._measure('make_claim', self.make_claim)
         if river is not None:
             return self._api_claim(river)
         else:
             return self._api_pass()
 
     def process_moves(self):
-        pass
+        scorer = self._scorer
+
+        for move in self.last_moves:
+            for kind, river, punter in self.board.apply(move):
+                if scorer is not None:
+                    scorer.claim(punter, river)
 
     def make_claim(self):
         pass
@@ -257,7 +939,16 @@ class PunterPlayer:
         return {'pass': {'punter': self.player_id}}
 
     def _api_claim(self, river):
-        return {'claim': {'punter': self.player_id, 'source': river[0], 'target': river[1]}}
+        source, target = self.map.river_ids(river)
+        return {'claim': {'punter': self.player_id, 'source': source, 'target': target}}
+
+    def _api_option(self, river):
+        source, target = self.map.river_ids(river)
+        return {'option': {'punter': self.player_id, 'source': source, 'target': target}}
+
+    def _api_splurge(self, route):
+        route = [self.map.sites[x] for x in route]
+        return {'splurge': {'punter': self.player_id, 'route': route}}
 
 
 class OfflinePlayer:
@@ -290,22 +981,10 @@ class RandomPlayer(PunterPlayer):
         if DEBUG:
             self.name = 'paiv-random'
 
-    def process_moves(self):
-        claims = set()
-
-        for move in self.last_moves:
-            claim = move.get('claim', None)
-            if claim is not None:
-                claims.add(tuple(sorted((claim['source'], claim['target']))))
-
-        self.claims |= claims
-
     def make_claim(self):
-        rivers = self.map['rivers']
-        rivers = set(rivers) - self.claims
+        rivers = self.board.free_rivers()
         if len(rivers) > 0:
-            claim = random.choice(list(rivers))
-            return claim
+            return random.choice(rivers)
 
 
 class RandomMinesPlayer(RandomPlayer):
@@ -314,44 +993,21 @@ class RandomMinesPlayer(RandomPlayer):
         if DEBUG:
             self.name = 'paiv-random-mines'
 
-    def process_moves(self):
-        claims = set()
-        my_claims = set()
-
-        for move in self.last_moves:
-            claim = move.get('claim', None)
-            if claim is not None:
-                r = tuple(sorted((claim['source'], claim['target'])))
-                claims.add(r)
-                if claim['punter'] == self.player_id:
-                    my_claims.add(r)
-
-        self.claims |= claims
-        self.my_claims |= my_claims
-
-    def _rivers_from(self, site):
-        rivers = self.map['rivers']
-        res = set()
-        for river in rivers:
-            if river[0] == site or river[1] == site:
-                res.add(river)
-        return res
-
     def make_claim(self):
+        board = self.board
         visited = set()
-        sites = set(self.map.get('mines', list()))
+        sites = set(self.map.mines)
 
         while len(sites) > 0:
-            rivers = set(r for site in sites for r in self._rivers_from(site))
+            rivers = set(r for site in sites for r in self.map.rivers_from(site))
 
-            avail = rivers - self.claims
+            avail = [r for r in rivers if board.is_free(r)]
             if len(avail) > 0:
-                claim = random.choice(list(avail))
-                return claim
+                return random.choice(avail)
 
             visited |= sites
-            paths = rivers & self.my_claims
-            sites = set(x for p in paths for x in p) - visited
+            paths = [r for r in rivers if board.owner(r) == self.player_id]
+            sites = set(x for r in paths for x in self.map.river_sites(r)) - visited
 
 
 def play():
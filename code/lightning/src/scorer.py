@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+import json
+
+
+class PlayerScore:
+    def __init__(self, distances, mines):
+        self.distances = distances
+        self.mine_list = mines
+        self.mine_sites = {site: i for i, site in enumerate(mines)}
+        self.mine_count = len(mines)
+
+        self.parent = dict()
+        self.size = dict()
+        self.weights = dict()
+        self.mines = dict()
+        self.scores = dict()
+
+        self.futures = list()
+        self.total = 0
+
+    def _add_site(self, site):
+        self.parent[site] = site
+        self.size[site] = 1
+
+        weights = [0] * self.mine_count
+        for i in range(self.mine_count):
+            d = self.distances.distance(i, site)
+            if d != self.distances.UNREACHABLE:
+                weights[i] = d * d
+        self.weights[site] = weights
+
+        mine = self.mine_sites.get(site, None)
+        self.mines[site] = [mine] if mine is not None else []
+        self.scores[site] = 0
+
+    def find(self, site):
+        parent = self.parent
+        root = site
+        while parent[root] != root:
+            root = parent[root]
+        while parent[site] != root:
+            parent[site], site = root, parent[site]
+        return root
+
+    def connect(self, x, y):
+        if x not in self.parent:
+            self._add_site(x)
+        if y not in self.parent:
+            self._add_site(y)
+
+        x = self.find(x)
+        y = self.find(y)
+        if x == y:
+            return
+
+        if self.size[x] < self.size[y]:
+            x, y = y, x
+
+        self.total -= self.scores.pop(x) + self.scores.pop(y)
+
+        weights = self.weights[x]
+        for i, w in enumerate(self.weights.pop(y)):
+            weights[i] += w
+
+        mines = self.mines[x]
+        mines.extend(self.mines.pop(y))
+
+        score = sum(weights[i] for i in mines)
+        self.scores[x] = score
+        self.total += score
+
+        self.parent[y] = x
+        self.size[x] += self.size.pop(y)
+
+    def _component(self, site):
+        if site in self.parent:
+            root = self.find(site)
+            return root, self.weights[root], self.mines[root]
+
+        weights = [0] * self.mine_count
+        for i in range(self.mine_count):
+            d = self.distances.distance(i, site)
+            if d != self.distances.UNREACHABLE:
+                weights[i] = d * d
+
+        mine = self.mine_sites.get(site, None)
+        return None, weights, [mine] if mine is not None else []
+
+    def delta(self, x, y):
+        rx, wx, mx = self._component(x)
+        ry, wy, my = self._component(y)
+
+        if rx is not None and rx == ry:
+            return 0
+
+        score = sum(wy[i] for i in mx) + sum(wx[i] for i in my)
+
+        for mine_index, site in self.futures:
+            mine = self.mine_list[mine_index]
+            if self._joins(mine, site, x, y, rx, ry):
+                d = self.distances.distance(mine_index, site)
+                if d != self.distances.UNREACHABLE:
+                    score += 2 * d * d * d
+
+        return score
+
+    def _joins(self, a, b, x, y, rx, ry):
+        ra = self.find(a) if a in self.parent else None
+        rb = self.find(b) if b in self.parent else None
+        ina_x = a == x if ra is None else ra == rx
+        ina_y = a == y if ra is None else ra == ry
+        inb_x = b == x if rb is None else rb == rx
+        inb_y = b == y if rb is None else rb == ry
+        return (ina_x and inb_y) or (ina_y and inb_x)
+
+    def copy(self):
+        other = PlayerScore.__new__(PlayerScore)
+        other.distances = self.distances
+        other.mine_list = self.mine_list
+        other.mine_sites = self.mine_sites
+        other.mine_count = self.mine_count
+        other.parent = dict(self.parent)
+        other.size = dict(self.size)
+        other.weights = {k: list(v) for k, v in self.weights.items()}
+        other.mines = {k: list(v) for k, v in self.mines.items()}
+        other.scores = dict(self.scores)
+        other.futures = list(self.futures)
+        other.total = self.total
+        return other
+
+    def gain(self, edges):
+        if len(self.futures) > 0:
+            other = self.copy()
+            for x, y in edges:
+                other.connect(x, y)
+            return other.score() - self.score()
+
+        parent = dict()
+        components = dict()
+
+        def find(key):
+            while parent[key] != key:
+                parent[key] = parent[parent[key]]
+                key = parent[key]
+            return key
+
+        for x, y in edges:
+            keys = list()
+            for site in (x, y):
+                root, weights, mines = self._component(site)
+                key = site if root is None else root
+                if key not in parent:
+                    parent[key] = key
+                    components[key] = (weights, mines, 0 if root is None else self.scores[root])
+                keys.append(find(key))
+            a, b = keys
+            if a != b:
+                parent[b] = a
+
+        groups = dict()
+        for key in parent:
+            groups.setdefault(find(key), list()).append(key)
+
+        gain = 0
+        for keys in groups.values():
+            if len(keys) < 2:
+                continue
+            weights = [0] * self.mine_count
+            mines = list()
+            for key in keys:
+                w, m, score = components[key]
+                for i, x in enumerate(w):
+                    weights[i] += x
+                mines.extend(m)
+                gain -= score
+            gain += sum(weights[i] for i in mines)
+
+        return gain
+
+    def connected(self, x, y):
+        if x not in self.parent or y not in self.parent:
+            return False
+        return self.find(x) == self.find(y)
+
+    def futures_score(self):
+        score = 0
+        for mine_index, site in self.futures:
+            d = self.distances.distance(mine_index, site)
+            if d == self.distances.UNREACHABLE:
+                continue
+            w = d * d * d
+            if self.connected(self.mine_list[mine_index], site):
+                score += w
+            else:
+                score -= w
+        return score
+
+    def score(self):
+        if len(self.futures) > 0:
+            return self.total + self.futures_score()
+        return self.total
+
+
+class Scorer:
+    def __init__(self, game_map, distances, players):
+        self.map = game_map
+        self.distances = distances
+
+        self.players = [PlayerScore(distances, game_map.mines) for _ in range(players)]
+
+    @classmethod
+    def from_board(cls, board, distances, players):
+        scorer = cls(board.map, distances, players)
+
+        for river, owner in enumerate(board.owners):
+            if owner >= 0:
+                scorer.claim(owner, river)
+
+        if board.options is not None:
+            for river, owner in enumerate(board.options):
+                if owner >= 0:
+                    scorer.claim(owner, river)
+
+        return scorer
+
+    def claim(self, player_id, river):
+        x, y = self.map.river_sites(river)
+        self.players[player_id].connect(x, y)
+
+    option = claim
+
+    def delta(self, player_id, river):
+        x, y = self.map.river_sites(river)
+        return self.players[player_id].delta(x, y)
+
+    def gain(self, player_id, rivers):
+        return self.players[player_id].gain([self.map.river_sites(river) for river in rivers])
+
+    def set_futures(self, player_id, futures):
+        player = self.players[player_id]
+        player.futures = [(player.mine_sites[mine], site) for mine, site in futures if mine in player.mine_sites]
+
+    def score(self, player_id):
+        return self.players[player_id].score()
+
+    def scores(self):
+        return [player.score() for player in self.players]
+
+
+def replay_log(logfile, futures=None):
+    from player import DistanceTable, PunterBoard, PunterMap
+
+    scorer = None
+    board = None
+    game_map = None
+    results = list()
+
+    for line in logfile:
+        try:
+            message = json.loads(line)
+        except ValueError:
+            continue
+
+        if 'map' in message:
+            game_map = PunterMap.from_protocol(message['map'])
+            board = PunterBoard(game_map)
+            distances = DistanceTable.build(game_map)
+            scorer = Scorer(game_map, distances, message['punters'])
+
+            settings = message.get('settings', None) or dict()
+            if settings.get('futures', False) and futures:
+                mines = set(message['map'].get('mines', list()))
+                for i in range(message['punters']):
+                    bids = futures.get(i, None) or futures.get(str(i), None) or list()
+                    scorer.set_futures(i, [(game_map.site_index(x['source']), game_map.site_index(x['target']))
+                        for x in bids if x['source'] in mines and x['target'] not in mines
+                            and game_map.site_index(x['target']) is not None])
+            continue
+
+        if scorer is None:
+            continue
+
+        stop = message.get('stop', None)
+        if stop is not None:
+            expected = {x['punter']: x['score'] for x in stop.get('scores', list())}
+            actual = scorer.scores()
+            results.append([(i, expected.get(i, None), score) for i, score in enumerate(actual)])
+            scorer = None
+            continue
+
+        for kind, river, punter in board.apply(message):
+            if kind == 'claim':
+                scorer.claim(punter, river)
+            else:
+                scorer.option(punter, river)
+
+    return results
+
+
+if __name__ == '__main__':
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(description='Replay a server log and compare scores')
+
+    parser.add_argument('logfile', nargs='?', type=argparse.FileType(mode='r'),
+        default=sys.stdin,
+        help='server log file')
+
+    parser.add_argument('--futures', type=argparse.FileType(mode='r'), metavar='FILE',
+        help='futures bid by each punter, JSON {punter: [{source, target}, ...]}')
+
+    args = parser.parse_args()
+
+    futures = json.load(args.futures) if args.futures is not None else None
+    failed = False
+
+    for game, scores in enumerate(replay_log(args.logfile, futures)):
+        for punter, expected, actual in scores:
+            ok = expected == actual
+            failed = failed or not ok
+            print('game {} punter {}: server {} scorer {}{}'.format(
+                game, punter, expected, actual, '' if ok else '  MISMATCH'))
+
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,278 @@
+#!/usr/bin/env python3 -u
+import math
+import os
+import random
+import sys
+import time
+
+from player import DEBUG, OfflinePlayer, PunterPlayer
+from zobrist import TABLE_SIZE, TranspositionTable, ZobristKeys
+
+
+SEARCH_FRACTION=float(os.environ.get('PUNTER_SEARCH_FRACTION', 0.8))
+
+SEARCH_DEPTH=int(os.environ.get('PUNTER_SEARCH_DEPTH', 4))
+
+SEARCH_VERBOSE=bool(os.environ.get('PUNTER_SEARCH_VERBOSE', None))
+
+
+class SearchStats:
+    def __init__(self, iterations, elapsed, candidates, best_visits, table_hits=0):
+        self.iterations = iterations
+        self.elapsed = elapsed
+        self.candidates = candidates
+        self.best_visits = best_visits
+        self.table_hits = table_hits
+
+    @property
+    def rate(self):
+        return self.iterations / self.elapsed if self.elapsed > 0 else 0
+
+    def __str__(self):
+        return 'search: {} iterations in {:.3f}s, {:.0f}/s, {} candidates, best visited {}, table hits {}'.format(
+            self.iterations, self.elapsed, self.rate, self.candidates, self.best_visits, self.table_hits)
+
+
+class PlayoutSearch:
+    EXPLORATION = 1.4
+    RETRIES = 8
+
+    def __init__(self, board, scorer, player_id, players, depth=SEARCH_DEPTH, candidates=None,
+            keys=None, table=None):
+        self.map = board.map
+        self.board = board
+        self.scorer = scorer
+        self.player_id = player_id
+        self.players = players
+        self.depth = depth
+
+        self.frontiers = self._frontiers()
+        if candidates is None:
+            candidates = self.frontiers[player_id] or board.free_rivers()
+        self.candidates = candidates
+
+        n = len(self.candidates)
+        self.visits = [0] * n
+        self.totals = [0] * n
+        self.iterations = 0
+
+        self.keys = keys
+        self.table = table if keys is not None else None
+        self.table_hits = 0
+
+    def _frontiers(self):
+        board = self.board
+        game_map = self.map
+
+        sites = [set(game_map.mines) for _ in range(self.players)]
+        for river, owner in enumerate(board.owners):
+            if owner >= 0:
+                sites[owner].update(game_map.river_sites(river))
+
+        if board.options is not None:
+            for river, owner in enumerate(board.options):
+                if owner >= 0:
+                    sites[owner].update(game_map.river_sites(river))
+
+        frontiers = list()
+        for player_sites in sites:
+            rivers = set(r for site in player_sites for r in game_map.rivers_from(site))
+            frontiers.append(sorted(r for r in rivers if board.is_free(r)))
+        return frontiers
+
+    def greedy(self):
+        scorer = self.scorer
+        deltas = [scorer.delta(self.player_id, river) for river in self.candidates]
+        return sorted(range(len(deltas)), key=lambda i: -deltas[i])
+
+    def run(self, deadline):
+        started = time.perf_counter()
+
+        if len(self.candidates) == 0:
+            self.elapsed = 0
+            return None
+
+        order = self.greedy()
+        best = order[0]
+
+        if self.table is not None:
+            self._load_table()
+
+        now = started
+        while now < deadline:
+            if self.iterations < len(order):
+                i = order[self.iterations]
+            else:
+                i = self._select()
+
+            self.totals[i] += self.playout(self.candidates[i])
+            self.visits[i] += 1
+            self.iterations += 1
+            now = time.perf_counter()
+
+        visited = [i for i, n in enumerate(self.visits) if n > 0]
+        if len(visited) > 0:
+            best = max(visited, key=lambda i: self.totals[i] / self.visits[i])
+
+        self.elapsed = now - started
+        self.best = best
+        return self.candidates[best]
+
+    def _load_table(self):
+        keys = self.keys
+        table = self.table
+
+        board = self.board
+        self.root_key = board.key if board.keys is keys else keys.hash(board)
+        self.base = self.scorer.score(self.player_id)
+
+        for i, river in enumerate(self.candidates):
+            x = table.lookup(self.root_key ^ keys.claim(river, self.player_id))
+            if x is not None:
+                visits, total = x
+                self.visits[i] += visits
+                self.totals[i] += total - visits * self.base
+                self.table_hits += 1
+
+    def _select(self):
+        means = [t / n for t, n in zip(self.totals, self.visits)]
+        scale = max(1, max(abs(x) for x in means))
+        log_total = math.log(sum(self.visits))
+        c = self.EXPLORATION * scale
+
+        return max(range(len(means)),
+            key=lambda i: means[i] + c * math.sqrt(log_total / self.visits[i]))
+
+    def playout(self, river):
+        frontiers = self.frontiers
+        players = self.players
+
+        keys = self.keys if self.table is not None else None
+
+        taken = {river}
+        mine = [river]
+        extra = [list() for _ in range(players)]
+        self._extend(extra[self.player_id], river)
+
+        if keys is not None:
+            key = self.root_key ^ keys.claim(river, self.player_id)
+            path = [key]
+
+        player_id = self.player_id
+        for _ in range(self.depth):
+            player_id = (player_id + 1) % players
+            move = self._random_move(frontiers[player_id], extra[player_id], taken)
+            if move is None:
+                continue
+            taken.add(move)
+            self._extend(extra[player_id], move)
+            if player_id == self.player_id:
+                mine.append(move)
+            if keys is not None:
+                key ^= keys.claim(move, player_id)
+                path.append(key)
+
+        gain = self.scorer.gain(self.player_id, mine)
+
+        if keys is not None:
+            value = self.base + gain
+            for key in path:
+                self.table.update(key, value)
+
+        return gain
+
+    def _extend(self, rivers, river):
+        x, y = self.map.river_sites(river)
+        rivers.extend(self.map.rivers_from(x))
+        rivers.extend(self.map.rivers_from(y))
+
+    def _random_move(self, frontier, extra, taken):
+        board = self.board
+        n = len(frontier)
+        total = n + len(extra)
+
+        if total > 0:
+            for _ in range(self.RETRIES):
+                k = random.randrange(total)
+                river = frontier[k] if k < n else extra[k - n]
+                if river not in taken and board.is_free(river):
+                    return river
+
+        count = self.map.river_count
+        for _ in range(self.RETRIES):
+            river = random.randrange(count)
+            if river not in taken and board.is_free(river):
+                return river
+
+    def stats(self):
+        best_visits = self.visits[self.best] if self.iterations > 0 else 0
+        return SearchStats(self.iterations, self.elapsed, len(self.candidates), best_visits, self.table_hits)
+
+
+class SearchPlayer(PunterPlayer):
+    def __init__(self, budget=None, depth=SEARCH_DEPTH, table_size=TABLE_SIZE):
+        super().__init__()
+        if DEBUG:
+            self.name = 'paiv-search'
+        self.budget = budget
+        self.depth = depth
+        self.search_stats = None
+        self.table_size = table_size
+        self.table = None
+        self.table_id = None
+        self.keys = None
+        self.keys_id = None
+
+    def _board_keys(self):
+        if self.table_size <= 0 or not self.players:
+            return None
+
+        keys_id = (self.map_hash, self.players)
+        if self.keys_id != keys_id:
+            self.keys = ZobristKeys.for_map(self.map, self.players, self.map_hash)
+            self.keys_id = keys_id
+        return self.keys
+
+    def transpositions(self):
+        keys = self._board_keys()
+        if keys is None:
+            return None, None
+
+        # the table lives with this player object, offline every move is a new
+        # process and starts empty, only an in-process host reuses it across turns
+        table_id = (self.map_hash, self.players, self.player_id)
+        if self.table_id != table_id:
+            self.table = TranspositionTable(self.table_size)
+            self.table_id = table_id
+
+        self.table.new_search()
+        return keys, self.table
+
+    def deadline(self):
+        budget = self.budget
+        if budget is None:
+            budget = self.timeout * SEARCH_FRACTION * (0.5 ** self.timeouts)
+        return self.started + budget
+
+    def make_claim(self):
+        keys, table = self.transpositions()
+        search = PlayoutSearch(self.board, self.scorer, self.player_id, self.players, depth=self.depth,
+            keys=keys, table=table)
+        river = search.run(self.deadline())
+
+        if river is not None:
+            self.search_stats = search.stats()
+            if SEARCH_VERBOSE:
+                print(self.search_stats, file=sys.stderr)
+
+        return river
+
+
+def play():
+    player = SearchPlayer()
+    controller = OfflinePlayer(player)
+    controller.run()
+
+
+if __name__ == '__main__':
+    play()
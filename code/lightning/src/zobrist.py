@@ -0,0 +1,94 @@
+import os
+import random
+import sys
+
+from array import array
+
+
+TABLE_SIZE=int(os.environ.get('PUNTER_TABLE_SIZE', 1 << 16))
+
+
+class ZobristKeys:
+    def __init__(self, river_count, players, seed=0):
+        rng = random.Random(seed)
+        self.players = players
+        self.claims = self._random_keys(rng, river_count * players)
+        self.options = self._random_keys(rng, river_count * players)
+
+    def _random_keys(self, rng, n):
+        # one big draw, offline every turn builds the keys again
+        keys = array('Q', rng.getrandbits(64 * n).to_bytes(8 * n, 'little') if n > 0 else b'')
+        if sys.byteorder != 'little':
+            keys.byteswap()
+        return keys
+
+    @classmethod
+    def for_map(cls, game_map, players, map_hash=None):
+        seed = int(map_hash[:16], 16) if map_hash else 0
+        return cls(game_map.river_count, players, seed)
+
+    def claim(self, river, owner):
+        return self.claims[river * self.players + owner]
+
+    def option(self, river, owner):
+        return self.options[river * self.players + owner]
+
+    def hash(self, board):
+        key = 0
+        for river, owner in enumerate(board.owners):
+            if owner >= 0:
+                key ^= self.claims[river * self.players + owner]
+
+        if board.options is not None:
+            for river, owner in enumerate(board.options):
+                if owner >= 0:
+                    key ^= self.options[river * self.players + owner]
+
+        return key
+
+
+class TranspositionTable:
+    def __init__(self, capacity=TABLE_SIZE):
+        size = 1
+        while size < capacity:
+            size <<= 1
+
+        self.mask = size - 1
+        self.keys = [None] * size
+        self.visits = array('I', [0]) * size
+        self.totals = [0] * size
+        self.generations = array('I', [0]) * size
+        self.generation = 0
+
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return sum(1 for x in self.keys if x is not None)
+
+    def new_search(self):
+        self.generation += 1
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, key):
+        i = key & self.mask
+        if self.keys[i] == key:
+            self.hits += 1
+            return self.visits[i], self.totals[i]
+        self.misses += 1
+
+    def update(self, key, value):
+        i = key & self.mask
+        current = self.keys[i]
+
+        if current == key:
+            self.visits[i] += 1
+            self.totals[i] += value
+            self.generations[i] = self.generation
+
+        elif current is None or self.generations[i] != self.generation or self.visits[i] <= 1:
+            self.keys[i] = key
+            self.visits[i] = 1
+            self.totals[i] = value
+            self.generations[i] = self.generation
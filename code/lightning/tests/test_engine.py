@@ -0,0 +1,26 @@
+import json
+import os
+import sys
+
+
+MYDIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(MYDIR, '..', 'src'))
+
+import engine
+
+
+DATA = os.path.join(MYDIR, 'data')
+
+
+def test_replay_server_log_with_futures_and_options():
+    with open(os.path.join(DATA, 'lambda-3p-fos.futures.json'), 'r') as fd:
+        futures = json.load(fd)
+
+    with open(os.path.join(DATA, 'lambda-3p-fos.log'), 'r') as fd:
+        results = engine.replay(fd, futures)
+
+    assert len(results) == 1
+    mismatches, scores = results[0]
+    assert mismatches == 0
+    for punter, expected, actual in scores:
+        assert expected == actual, punter
@@ -0,0 +1,94 @@
+import glob
+import json
+import os
+import sys
+
+import pytest
+
+
+MYDIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(MYDIR, '..', 'src'))
+
+import player
+
+
+MAPS = os.path.join(MYDIR, '..', '..', '..', 'server', 'maps')
+
+
+def load_map(name):
+    with open(os.path.join(MAPS, name), 'r') as fd:
+        return json.load(fd)
+
+
+def offline_turn(message, cache=None):
+    p = player.RandomMinesPlayer()
+    p.map_cache = cache
+    me = p.handshake()
+    p.handshake({'you': me['me']})
+    return p.move(json.loads(json.dumps(message)))
+
+
+def decode_state(state):
+    return player.STATE_CODECS[player.STATE_CODEC]().decode(state)
+
+
+def test_map_cache_keeps_map_out_of_state(tmp_path):
+    cache = player.MapCache(str(tmp_path))
+    game_map = load_map('sample.json')
+
+    response = offline_turn({'punter': 0, 'punters': 2, 'map': game_map}, cache)
+    assert len(glob.glob(os.path.join(str(tmp_path), '*.map'))) == 1
+    assert 'map' not in decode_state(response['state'])
+
+    state = response['state']
+    moves = [{'pass': {'punter': 0}}, {'pass': {'punter': 1}}]
+    response = offline_turn({'move': {'moves': moves}, 'state': state}, cache)
+    assert 'claim' in response
+    assert 'map' not in decode_state(response['state'])
+
+    for fn in glob.glob(os.path.join(str(tmp_path), '*')):
+        os.remove(fn)
+
+    state = response.pop('state')
+    moves = [response, {'pass': {'punter': 1}}]
+    with pytest.raises(player.PunterStateError):
+        offline_turn({'move': {'moves': moves}, 'state': state}, cache)
+
+
+def test_map_inline_without_cache(tmp_path):
+    game_map = load_map('sample.json')
+
+    # a file in the way, the cache cannot store anything
+    blocked = tmp_path / 'blocked'
+    blocked.write_text('')
+    for cache in (None, player.MapCache(str(blocked))):
+        response = offline_turn({'punter': 0, 'punters': 2, 'map': game_map}, cache)
+        assert 'map' in decode_state(response['state'])
+
+        state = response['state']
+        moves = [{'pass': {'punter': 0}}, {'pass': {'punter': 1}}]
+        response = offline_turn({'move': {'moves': moves}, 'state': state}, cache)
+        assert 'claim' in response
+        assert 'map' in decode_state(response['state'])
+
+
+def test_truncated_distances_rebuilt(tmp_path):
+    cache = player.MapCache(str(tmp_path))
+    game_map = player.PunterMap.from_protocol(load_map('lambda.json'))
+    key = game_map.digest()
+
+    table = player.DistanceTable.build(game_map)
+    assert cache.store_distances(key, table)
+    fn = glob.glob(os.path.join(str(tmp_path), '*.dist'))[0]
+    with open(fn, 'rb') as fd:
+        data = fd.read()
+
+    for size in (len(data) - 1, len(data) - 2):
+        with open(fn, 'wb') as fd:
+            fd.write(data[:size])
+        assert cache.load_distances(key, game_map) is None
+
+    with open(fn, 'wb') as fd:
+        fd.write(data)
+    x = cache.load_distances(key, game_map)
+    assert list(x.distances) == list(table.distances)
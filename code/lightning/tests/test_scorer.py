@@ -0,0 +1,28 @@
+import json
+import os
+import sys
+
+
+MYDIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(MYDIR, '..', 'src'))
+
+import scorer
+
+
+DATA = os.path.join(MYDIR, 'data')
+
+
+def load_futures(name):
+    with open(os.path.join(DATA, name), 'r') as fd:
+        return json.load(fd)
+
+
+def test_replay_server_log_with_futures():
+    futures = load_futures('lambda-3p-fos.futures.json')
+
+    with open(os.path.join(DATA, 'lambda-3p-fos.log'), 'r') as fd:
+        results = scorer.replay_log(fd, futures)
+
+    assert len(results) == 1
+    for punter, expected, actual in results[0]:
+        assert expected == actual, punter
@@ -0,0 +1,70 @@
+import json
+import os
+import random
+import sys
+
+
+MYDIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(MYDIR, '..', 'src'))
+
+import player
+import search
+import zobrist
+
+
+MAPS = os.path.join(MYDIR, '..', '..', '..', 'server', 'maps')
+
+
+def load_map(name):
+    with open(os.path.join(MAPS, name), 'r') as fd:
+        return json.load(fd)
+
+
+def test_running_key_matches_hash():
+    game_map = player.PunterMap.from_protocol(load_map('lambda.json'))
+    keys = zobrist.ZobristKeys.for_map(game_map, 3, game_map.digest())
+    board = player.PunterBoard(game_map, keys=keys)
+    board.enable_options()
+
+    rng = random.Random(1)
+    rivers = list(range(game_map.river_count))
+    rng.shuffle(rivers)
+
+    for turn, river in enumerate(rivers[:20]):
+        source, target = game_map.river_sites(river)
+        source, target = game_map.sites[source], game_map.sites[target]
+        punter = turn % 3
+        kind = ('claim', 'option', 'splurge')[turn % 3] if turn >= 10 else 'claim'
+        if kind == 'splurge':
+            move = {'splurge': {'punter': punter, 'route': [source, target]}}
+        else:
+            move = {kind: {'punter': punter, 'source': source, 'target': target}}
+        assert len(board.apply(move)) > 0
+        assert board.key == keys.hash(board)
+
+    # undo
+    for river in rivers[:5]:
+        board.claim(river, board.FREE)
+        assert board.key == keys.hash(board)
+
+
+def test_key_travels_with_state():
+    game_map = load_map('sample.json')
+
+    def turn(message):
+        p = search.SearchPlayer(budget=0.01)
+        p.map_cache = None
+        me = p.handshake()
+        p.handshake({'you': me['me']})
+        response = p.move(json.loads(json.dumps(message)))
+        return p, response
+
+    p, response = turn({'punter': 0, 'punters': 2, 'map': game_map})
+    moves = [{'pass': {'punter': 0}}, {'pass': {'punter': 1}}]
+    for _ in range(3):
+        state = response.pop('state')
+        assert 'zobrist' in player.STATE_CODECS[player.STATE_CODEC]().decode(state)
+        p, response = turn({'move': {'moves': moves}, 'state': state})
+        assert p.board.keys is not None
+        assert p.board.key == p.keys.hash(p.board)
+        moves = [response, {'pass': {'punter': 1}}]
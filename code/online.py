@@ -1,11 +1,32 @@
 #!/usr/bin/env python3 -u
+import importlib
+import importlib.util
+import errno
 import io
 import json
+import os
+import select
 import socket
 import subprocess
+import sys
+import time
 
 from collections import OrderedDict
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+JSON_BACKEND=os.environ.get('PUNTER_JSON', None)
+
+MOVE_TIMEOUT=1.0
+
+MOVE_MARGIN=0.05
+
+RELAY_METRICS=os.environ.get('PUNTER_RELAY_METRICS', None)
+
 
 class PunterError(Exception):
     pass
@@ -19,51 +40,137 @@ class PunterServerError(PunterError):
     pass
 
 
-class PunterTransport:
-    def send(self, obj):
-        # print('< sending', obj)
-        packet = json.dumps(obj, separators=(',', ':'))
-        packet = bytes(packet, 'utf-8')
-        header = bytes('%d:' % len(packet), 'ascii')
-        self.write(header)
-        self.write(packet)
+class PunterTimeoutError(PunterTransportError):
+    pass
 
-    def receive(self):
-        chunks = []
 
-        total = 20
-        body = ''
+class JsonCodec:
+    def __init__(self, ordered=False):
+        self.object_pairs_hook = OrderedDict if ordered else None
 
-        while True:
-            chunk = self.read(1)
-            if chunk == b'':
+    def dumps(self, obj):
+        return bytes(json.dumps(obj, separators=(',', ':')), 'utf-8')
+
+    def loads(self, data):
+        return json.loads(data, object_pairs_hook=self.object_pairs_hook)
+
+
+class OrjsonCodec:
+    def dumps(self, obj):
+        return orjson.dumps(obj)
+
+    def loads(self, data):
+        return orjson.loads(data)
+
+
+JSON_CODECS = {
+    'json': JsonCodec,
+    'json-ordered': lambda: JsonCodec(ordered=True),
+}
+
+if orjson is not None:
+    JSON_CODECS['orjson'] = OrjsonCodec
+
+
+def json_codec(name=None):
+    name = name or JSON_BACKEND
+    if name not in JSON_CODECS:
+        name = 'orjson' if orjson is not None else 'json'
+    return JSON_CODECS[name]()
+
+
+class PunterFrameReader:
+    CHUNK_SIZE = 65536
+    MAX_HEADER = 20
+
+    def __init__(self, transport):
+        self.transport = transport
+        self.buffer = bytearray()
+
+    def read_frame(self, deadline=None):
+        offset = self._read_header(deadline)
+        size = int(self.buffer[:offset])
+        start = offset + 1
+
+        if len(self.buffer) - start >= size:
+            body = self.buffer[start:start + size]
+            del self.buffer[:start + size]
+            return body
+
+        body = bytearray(size)
+        view = memoryview(body)
+
+        pos = len(self.buffer) - start
+        view[:pos] = self.buffer[start:]
+        self.buffer.clear()
+
+        while pos < size:
+            self._wait(deadline)
+            n = self.transport.readinto(view[pos:])
+            if n == 0:
                 raise PunterTransportError()
+            if n is not None:
+                pos += n
 
-            chunks.append(chunk)
+        return body
 
-            data = str(b''.join(chunks), 'utf-8')
-            parts = data.split(':', 1)
-            if len(parts) == 2:
-                body = parts[1]
-                total = int(parts[0]) - len(body)
-                break
+    def _read_header(self, deadline):
+        offset = self.buffer.find(b':')
 
-        chunks = []
+        while offset < 0:
+            if len(self.buffer) > self.MAX_HEADER:
+                raise PunterTransportError('invalid frame header')
 
-        while total > 0:
-            chunk = self.read(total)
+            self._wait(deadline)
+            chunk = self.transport.read(self.CHUNK_SIZE)
             if chunk == b'':
                 raise PunterTransportError()
 
-            chunks.append(chunk)
-            total -= len(chunk)
+            if chunk is not None:
+                self.buffer += chunk
+                offset = self.buffer.find(b':')
+
+        return offset
+
+    def _wait(self, deadline):
+        if deadline is not None and not self.transport.wait(deadline - time.perf_counter()):
+            raise PunterTimeoutError()
+
+
+class PunterTransport:
+    def __init__(self, codec=None):
+        self.reader = PunterFrameReader(self)
+        self.codec = codec or json_codec()
+        self.bytes_sent = 0
+        self.bytes_received = 0
+
+    def send(self, obj):
+        # print('< sending', obj)
+        packet = self.codec.dumps(obj)
+        header = bytes('%d:' % len(packet), 'ascii')
+        self.writev([header, packet])
+        self.bytes_sent += len(header) + len(packet)
+
+    def writev(self, buffers):
+        self.write(b''.join(buffers))
 
-        response = b''.join(chunks)
-        response = body + str(response, 'utf-8')
-        response = json.loads(response, object_pairs_hook=OrderedDict)
+    def receive(self, deadline=None):
+        body = self.reader.read_frame(deadline)
+        self.bytes_received += len(body) + len(str(len(body))) + 1
+        response = self.codec.loads(body)
         # print('> received', response)
         return response
 
+    def readinto(self, view):
+        chunk = self.read(len(view))
+        if chunk:
+            view[:len(chunk)] = chunk
+            return len(chunk)
+        return None if chunk is None else 0
+
+    def wait(self, timeout):
+        return True
+
     def close(self):
         pass
 
@@ -86,14 +193,36 @@ class PunterFileTransport(PunterTransport):
     def read(self, n):
         return self.rfile.read(n)
 
+    def readinto(self, view):
+        return self.rfile.readinto(view)
+
+    def wait(self, timeout):
+        ready, _, _ = select.select([self.rfile], [], [], max(0, timeout))
+        return len(ready) > 0
+
 
 class PunterFilenoTransport(PunterFileTransport):
     def __init__(self, rfd, wfd):
-        self.rfile = io.open(rfd, 'rb', 0)
-        self.wfile = io.open(wfd, 'wb', 0)
         self.samefds = rfd == wfd
+        self.rfile = io.open(rfd, 'rb', 0)
+        self.wfile = io.open(wfd, 'wb', 0, closefd=not self.samefds)
         super().__init__(self.rfile, self.wfile)
 
+    def writev(self, buffers):
+        if not hasattr(os, 'writev'):
+            return super().writev(buffers)
+
+        fd = self.wfile.fileno()
+        views = [memoryview(x) for x in buffers]
+
+        while len(views) > 0:
+            n = os.writev(fd, views)
+            while len(views) > 0 and n >= len(views[0]):
+                n -= len(views[0])
+                views.pop(0)
+            if n > 0:
+                views[0] = views[0][n:]
+
     def close(self):
         self.rfile.close()
         if not self.samefds:
@@ -101,13 +230,14 @@ class PunterFilenoTransport(PunterFileTransport):
 
 
 class PunterSocketTransport(PunterFilenoTransport):
-    def __init__(self, socket):
-        super().__init__(rfd=socket.fileno(), wfd=socket.fileno())
-        self.socket = socket
+    def __init__(self, sock):
+        super().__init__(rfd=sock.fileno(), wfd=sock.fileno())
+        self.socket = sock
+        self.socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
 
     def close(self):
         super().close()
-        self.socket.close()
+        self.socket.detach()
 
 
 class PunterMemoryTransport(PunterTransport):
@@ -133,15 +263,74 @@ class Player:
     def write(self, response):
         pass
 
+    def timeout(self, seconds):
+        pass
+
+    def sent(self, server=None):
+        pass
+
+
+class FallbackMoves:
+    def __init__(self):
+        self.punter = None
+        self.free = dict()
+
+    def _key(self, source, target):
+        return (source, target) if source <= target else (target, source)
+
+    def update(self, message):
+        game_map = message.get('map', None)
+        if game_map is not None:
+            self.punter = message.get('punter', None)
+            self.free = dict()
+            for river in game_map.get('rivers', list()):
+                self.free[self._key(river['source'], river['target'])] = (river['source'], river['target'])
+
+        move = message.get('move', None) or message.get('stop', None) or dict()
+        for x in move.get('moves', None) or list():
+            self.apply(x)
+
+    def apply(self, move):
+        claim = move.get('claim', None)
+        splurge = move.get('splurge', None)
+
+        if claim is not None:
+            self.free.pop(self._key(claim['source'], claim['target']), None)
+        elif splurge is not None:
+            route = splurge.get('route', None) or list()
+            for source, target in zip(route, route[1:]):
+                self.free.pop(self._key(source, target), None)
+
+    def move(self):
+        for source, target in self.free.values():
+            move = {'claim': {'punter': self.punter, 'source': source, 'target': target}}
+            self.apply(move)
+            return move
+        return {'pass': {'punter': self.punter}}
+
 
 class OfflinePlayer(Player):
 
-    def __init__(self, cmd, name=None, logfile=None):
+    def __init__(self, cmd, name=None, logfile=None, warm=False, move_timeout=MOVE_TIMEOUT, margin=MOVE_MARGIN,
+            metrics=None):
         self.cmd = cmd
         self._name = name or 'offline-player'
         self.state = None
         self.proc = None
         self.transport = None
+        self.warm = warm
+        self.spare = None
+        self.spare_transport = None
+        self.timeout_notice = None
+
+        self.move_timeout = move_timeout
+        self.margin = margin
+        self.deadline = None
+        self.fallback = FallbackMoves()
+        self.fallbacks = 0
+        self.pending_moves = None
+        self.metrics = metrics
+        self.sent_at = None
 
         self.clientlog = io.open(logfile, 'a', 1) if logfile else subprocess.DEVNULL
 
@@ -152,8 +341,20 @@ class OfflinePlayer(Player):
         self.close()
 
     def close(self):
+        self._close_process()
+        self._close_spare()
+
+    def _close_spare(self):
+        if self.spare is not None:
+            self.spare.kill()
+            self.spare.wait()
+            self.spare = None
+            self.spare_transport = None
+
+    def _close_process(self):
         if self.proc is not None:
             self.proc.kill()
+            self.proc.wait()
             self.proc = None
 
     @property
@@ -161,46 +362,208 @@ class OfflinePlayer(Player):
         self._open_process()
         return self._name
 
+    def _spawn(self):
+        t = time.perf_counter()
+        proc = subprocess.Popen(self.cmd, bufsize=0,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=self.clientlog)
+        if self.metrics is not None:
+            self.metrics.add('spawn', time.perf_counter() - t)
+        return proc
+
     def _open_process(self):
         if self.proc is None:
 
-            self.proc = subprocess.Popen(self.cmd, bufsize=0,
-                stdin=subprocess.PIPE,
-                stdout=subprocess.PIPE,
-                stderr=self.clientlog)
+            if self.spare_transport is not None:
+                self.proc, self.spare = self.spare, None
+                self.transport, self.spare_transport = self.spare_transport, None
+                return
+
+            if self.spare is not None:
+                self.proc, self.spare = self.spare, None
+            else:
+                self.proc = self._spawn()
 
             self.transport = PunterFileTransport(self.proc.stdout, self.proc.stdin)
-            self._handshake()
 
-    def _handshake(self):
-        handshake = self.transport.receive()
+            t = time.perf_counter()
+            self._handshake(self.transport, deadline=self.deadline)
+            if self.metrics is not None:
+                self.metrics.add('handshake', time.perf_counter() - t)
+
+    def _handshake(self, transport, deadline=None):
+        handshake = transport.receive(deadline=deadline)
 
         if 'me' in handshake:
             self._name = handshake.get('me', None)
 
             response = {'you': self._name}
-            self.transport.send(response)
+            transport.send(response)
         else:
             raise PunterError()
 
     def read(self):
-        self._open_process()
+        # pending_moves is set while a move is out, only moves can fall back
+        if self.proc is None and self.pending_moves is None:
+            self._open_process()
+
+        fallback = self.proc is None
+        received = 0
+        if not fallback:
+            received = self.transport.bytes_received
+            try:
+                # a large or stalled frame must not run past the deadline either
+                response = self.transport.receive(deadline=self.deadline)
+            except (ValueError, PunterError):
+                if self.pending_moves is None:
+                    raise
+                fallback = True
+            else:
+                self.pending_moves = None
+                self.state = response.pop('state', None)
+            received = self.transport.bytes_received - received
 
-        response = self.transport.receive()
+        if fallback:
+            self.fallbacks += 1
+            response = self.fallback.move()
 
-        self.state = response.pop('state', None)
+        if self.metrics is not None:
+            if self.sent_at is not None:
+                self.metrics.add('compute', time.perf_counter() - self.sent_at)
+            self.metrics.count('player_bytes_received', received)
+            if fallback:
+                self.metrics.count('fallbacks', 1)
+        self.sent_at = None
 
-        self.close()
+        self._close_process()
 
         return response
 
+    def sent(self, server=None):
+        # the server is busy with the other punters, start the next client now
+        # and finish its handshake unless the server answers first
+        self.prewarm()
+        if self.spare is None or self.spare_transport is not None or server is None:
+            return
+        if len(server.reader.buffer) > 0:
+            return
+
+        ready, _, _ = select.select([self.spare.stdout, server.rfile], [], [], self.move_timeout)
+        if self.spare.stdout in ready:
+            transport = PunterFileTransport(self.spare.stdout, self.spare.stdin)
+            deadline = None if self.move_timeout is None else time.perf_counter() + self.move_timeout
+            try:
+                self._handshake(transport, deadline=deadline)
+            except (OSError, ValueError, PunterError):
+                # a broken spare costs a cold spawn on the next move, not the game
+                self._close_spare()
+                return
+            self.spare_transport = transport
+
+    def prewarm(self):
+        if self.warm and self.spare is None:
+            self.spare = self._spawn()
+
     def write(self, response):
-        self._open_process()
+        received = time.perf_counter()
+        self.fallback.update(response)
+
+        move = response.get('move', None)
+        if move is not None and self.move_timeout is not None:
+            self.deadline = received + self.move_timeout - self.margin
+        else:
+            self.deadline = None
 
-        response = OrderedDict(response)
+        response = dict(response)
         response['state'] = self.state
+        if self.timeout_notice is not None:
+            response['timeout'], self.timeout_notice = self.timeout_notice, None
+
+        moves = self.pending_moves
+        if moves is not None:
+            key = 'move' if move is not None else 'stop'
+            x = dict(response.get(key, None) or dict())
+            x['moves'] = moves + (x.get('moves', None) or list())
+            response[key] = x
+        if move is not None:
+            self.pending_moves = response['move'].get('moves', None) or list()
+
+        try:
+            self._open_process()
+            sent = self.transport.bytes_sent
+            self.transport.send(response)
+        except (OSError, ValueError, PunterError):
+            if move is None:
+                raise
+            # the client died or hung before it got the move, read() falls back
+            self._close_process()
+            return
+
+        self.sent_at = time.perf_counter()
+        if self.metrics is not None:
+            self.metrics.count('player_bytes_sent', self.transport.bytes_sent - sent)
+
+    def timeout(self, seconds):
+        self.timeout_notice = seconds
+        if self.move_timeout is not None:
+            self.move_timeout = seconds
+
+
+class InProcessPlayer(Player):
+
+    def __init__(self, player):
+        self.player = player
+        self.response = None
+
+        me = self.player.handshake()
+        self.player.handshake({'you': me.get('me', None)})
+
+    def __enter__(self):
+        pass
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
 
-        self.transport.send(response)
+    def close(self):
+        pass
+
+    @property
+    def name(self):
+        return self.player.name
+
+    def read(self):
+        response, self.response = self.response, None
+        return response
+
+    def write(self, response):
+        self.response = self.player.play(response)
+
+    def timeout(self, seconds):
+        self.player.play({'timeout': seconds})
+
+
+def load_player_class(spec):
+    source, _, class_name = spec.rpartition(':')
+    if not source:
+        raise PunterError('expected module:Class or path.py:Class, got %s' % spec)
+
+    if source.endswith('.py') or os.path.sep in source:
+        path = os.path.abspath(source)
+        sys.path.insert(0, os.path.dirname(path))
+        module_name = os.path.splitext(os.path.basename(path))[0]
+        module_spec = importlib.util.spec_from_file_location(module_name, path)
+        module = importlib.util.module_from_spec(module_spec)
+        sys.modules[module_name] = module
+        module_spec.loader.exec_module(module)
+    else:
+        module = importlib.import_module(source)
+
+    return getattr(module, class_name)
+
+
+def load_player(spec):
+    return load_player_class(spec)()
 
 
 class OnlinePlayer(Player):
@@ -235,11 +598,16 @@ class OnlinePlayer(Player):
         elif timeout is not None:
             if not self.silent:
                 print('** timeout is ', timeout)
+            self.player.timeout(timeout)
         else:
             if response.get('stop', None) is not None:
                 self.state = self.STATE_SCORING
             return self.player.write(response)
 
+    def sent(self, server=None):
+        if self.state != self.STATE_SCORING:
+            self.player.sent(server)
+
     def _handshake(self, response=None):
         if response is None:
             return self._api_me()
@@ -250,16 +618,113 @@ class OnlinePlayer(Player):
         return {'me': self.name or self.player.name}
 
 
+class LatencyStats:
+    def __init__(self):
+        self.samples = []
+
+    def add(self, seconds):
+        self.samples.append(seconds)
+
+    def percentile(self, p, samples=None):
+        samples = samples or sorted(self.samples)
+        if len(samples) == 0:
+            return None
+        i = min(len(samples) - 1, int(round(p / 100 * (len(samples) - 1))))
+        return samples[i]
+
+    def summary(self):
+        samples = sorted(self.samples)
+        if len(samples) == 0:
+            return {'count': 0}
+
+        ms = lambda x: round(x * 1000, 3)
+        return {
+            'count': len(samples),
+            'mean_ms': ms(sum(samples) / len(samples)),
+            'p50_ms': ms(self.percentile(50, samples)),
+            'p99_ms': ms(self.percentile(99, samples)),
+            'max_ms': ms(samples[-1]),
+        }
+
+    def __str__(self):
+        return ' '.join('%s=%s' % (k, v) for k, v in self.summary().items())
+
+
+class RelayMetrics:
+    TIMINGS = ('server_wait', 'spawn', 'handshake', 'compute')
+
+    def __init__(self, sink=None):
+        self.sink = sink
+        self.turn = dict()
+        self.turns = 0
+        self.timings = {name: LatencyStats() for name in self.TIMINGS}
+        self.totals = dict()
+
+    def add(self, name, seconds):
+        self.turn[name + '_ms'] = round(self.turn.get(name + '_ms', 0) + seconds * 1000, 3)
+        self.timings[name].add(seconds)
+
+    def count(self, name, n):
+        self.turn[name] = self.turn.get(name, 0) + n
+        self.totals[name] = self.totals.get(name, 0) + n
+
+    def emit_turn(self, **fields):
+        if len(self.turn) > 0:
+            fields['turn'] = self.turns
+            fields.update(self.turn)
+            self._write(fields)
+            self.turn = dict()
+            self.turns += 1
+
+    def summary(self):
+        res = {'turns': self.turns}
+        for name, stats in self.timings.items():
+            x = stats.summary()
+            if x['count'] > 0:
+                x['total_ms'] = round(sum(stats.samples) * 1000, 3)
+                res[name] = x
+        res.update(self.totals)
+        return res
+
+    def emit_summary(self, **fields):
+        fields['summary'] = self.summary()
+        self._write(fields)
+
+    def _write(self, obj):
+        if self.sink is None:
+            return
+        line = json.dumps(obj) + '\n'
+        if self.sink in ('-', 'stderr'):
+            sys.stderr.write(line)
+            sys.stderr.flush()
+        else:
+            with open(self.sink, 'a') as fd:
+                fd.write(line)
+
+    def __str__(self):
+        x = self.summary()
+        parts = ['turns=%d' % x['turns']]
+        for name in self.TIMINGS:
+            if name in x:
+                parts.append('%s=%.1fms' % (name, x[name]['total_ms']))
+        for name, n in self.totals.items():
+            parts.append('%s=%d' % (name, n))
+        return ' '.join(parts)
+
+
 class PunterServer:
     PORT_BASE = 9000
     MAP1_SAMPLE = 0
 
-    def __init__(self, host, port=None, silent=False):
+    def __init__(self, host, port=None, silent=False, metrics=None):
         self.transport = None
         self.host = host
         self.port = port
         self.host_ip = socket.gethostbyname(self.host)
         self.silent = silent
+        self.latency = LatencyStats()
+        self.discovery = None
+        self.metrics = metrics
 
     def __enter__(self):
         pass
@@ -268,13 +733,18 @@ class PunterServer:
         if self.transport is not None:
             self.transport.close()
 
-    def play(self, player):
-        self._open_map(port=self.port)
+    def play(self, player, transport=None):
+        if transport is not None:
+            self.transport = transport
+        else:
+            self._open_map(port=self.port)
 
         while player.ready() and self.transport is not None:
             message = player.read()
+            if self.metrics is not None:
+                self.metrics.emit_turn(port=self.port)
             while True:
-                response = self._send_receive(message)
+                response = self._send_receive(message, sent=player.sent)
                 timeout = response.get('timeout', None)
 
                 message = player.write(response)
@@ -282,19 +752,26 @@ class PunterServer:
                 if timeout is None and message is None:
                     break
 
+        if self.metrics is not None:
+            self.metrics.emit_turn(port=self.port)
+            self.metrics.emit_summary(port=self.port)
+
+        if not self.silent:
+            print(': latency', self.latency)
+            if self.metrics is not None:
+                print(': relay', self.metrics)
+
     def _open_map(self, port=None):
+        t = time.perf_counter()
         if port is not None:
             self.transport = self._connect(port)
         else:
-            for n in range(0, 10):
-                port = self.PORT_BASE + n
-                self.transport = self._connect(port)
-                if self.transport is not None:
-                    break
+            self.transport = self._probe([self.PORT_BASE + n for n in range(0, 10)])
+        self.discovery = time.perf_counter() - t
 
         if self.transport is not None:
             if not self.silent:
-                print(': connected')
+                print(': connected', self.port, 'in %.1f ms' % (self.discovery * 1000))
         else:
             raise PunterServerError('could not connect')
 
@@ -308,26 +785,97 @@ class PunterServer:
             sock.connect((self.host_ip, port))
             # sock.settimeout(5)
             sock.setblocking(True)
+            self.port = port
             return PunterSocketTransport(sock)
         except:
             sock.close()
             return None
 
-    def _send_receive(self, obj=None):
-        if obj is not None:
-            self.transport.send(obj)
+    def _probe(self, ports, timeout=2):
+        if not self.silent:
+            print(': trying', self.host, ', '.join(str(x) for x in ports))
+
+        pending = dict()
+        for port in ports:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            sock.setblocking(False)
+            error = sock.connect_ex((self.host_ip, port))
+            if error in (0, errno.EINPROGRESS, errno.EWOULDBLOCK):
+                pending[sock] = port
+            else:
+                sock.close()
+
+        found = None
+        deadline = time.perf_counter() + timeout
+        try:
+            while found is None and pending:
+                wait = deadline - time.perf_counter()
+                if wait <= 0:
+                    break
+                _, writable, _ = select.select([], list(pending), [], wait)
+                for sock in writable:
+                    port = pending.pop(sock)
+                    if found is None and sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR) == 0:
+                        found = sock
+                        self.port = port
+                    else:
+                        sock.close()
+        finally:
+            for sock in pending:
+                sock.close()
+
+        if found is None:
+            return None
 
-        return self.transport.receive()
+        found.setblocking(True)
+        return PunterSocketTransport(found)
 
+    def _send_receive(self, obj=None, sent=None):
+        if obj is None:
+            return self.transport.receive()
 
-def play(name, host, port, cmd, logfile, silent=False):
-    player = OfflinePlayer(cmd, logfile=logfile)
-    player = OnlinePlayer(player, name=name, silent=silent)
+        bytes_sent = self.transport.bytes_sent
+        bytes_received = self.transport.bytes_received
 
-    server = PunterServer(host=host, port=port, silent=silent)
-    with server:
+        t = time.perf_counter()
+        self.transport.send(obj)
+        if sent is not None:
+            sent(self.transport)
+        response = self.transport.receive()
+        elapsed = time.perf_counter() - t
+        self.latency.add(elapsed)
+
+        if self.metrics is not None:
+            self.metrics.add('server_wait', elapsed)
+            self.metrics.count('server_bytes_sent', self.transport.bytes_sent - bytes_sent)
+            self.metrics.count('server_bytes_received', self.transport.bytes_received - bytes_received)
+
+        return response
+
+
+def play(name, host, port, cmd, logfile, silent=False, warm=False, plugin=None,
+        move_timeout=MOVE_TIMEOUT, margin=MOVE_MARGIN, metrics=RELAY_METRICS):
+    # measuring costs a few clock reads and counters per turn, only when asked
+    metrics = RelayMetrics(metrics) if metrics else None
+
+    if plugin is not None:
+        offline = InProcessPlayer(load_player(plugin))
+    else:
+        offline = OfflinePlayer(cmd, logfile=logfile, warm=warm, move_timeout=move_timeout, margin=margin,
+            metrics=metrics)
+
+    player = OnlinePlayer(offline, name=name, silent=silent)
+
+    server = PunterServer(host=host, port=port, silent=silent, metrics=metrics)
+    with server, offline:
         server.play(player)
 
+    fallbacks = getattr(offline, 'fallbacks', 0)
+    if fallbacks > 0 and not silent:
+        print(': fallback moves', fallbacks)
+
+    return server.latency.summary()
+
 
 if __name__ == '__main__':
     import argparse
@@ -354,12 +902,30 @@ if __name__ == '__main__':
     parser.add_argument('--cmd', type=str, default=default_cmd,
         help='offline client command line')
 
+    parser.add_argument('--player', type=str, metavar='MODULE:CLASS',
+        help='run a Python PunterPlayer in-process instead of --cmd, e.g. lightning/src/player.py:RandomMinesPlayer')
+
     parser.add_argument('--log', type=str, default='client.log',
         help='client log file')
 
     parser.add_argument('--no-log', action='store_true',
         help='suppress client log')
 
+    parser.add_argument('-w', '--warm', action='store_true',
+        help='keep a spawned offline client ready for the next move')
+
+    parser.add_argument('-t', '--move-timeout', type=float, default=MOVE_TIMEOUT,
+        help='server move timeout in seconds, %s' % MOVE_TIMEOUT)
+
+    parser.add_argument('--margin', type=float, default=MOVE_MARGIN,
+        help='send a fallback move this many seconds before the move timeout, %s' % MOVE_MARGIN)
+
+    parser.add_argument('--no-watchdog', action='store_true',
+        help='wait for the offline client however long it takes')
+
+    parser.add_argument('--metrics', type=str, default=RELAY_METRICS, metavar='FILE',
+        help='append per-turn relay metrics as JSON lines, - for stderr, $PUNTER_RELAY_METRICS')
+
     parser.add_argument('-s', '--silent', action='store_true',
         help='be quiet')
 
@@ -372,4 +938,9 @@ if __name__ == '__main__':
         port=args.port,
         cmd=args.cmd,
         logfile=(None if args.no_log else args.log),
-        silent=args.silent)
+        silent=args.silent,
+        warm=args.warm,
+        plugin=args.player,
+        move_timeout=(None if args.no_watchdog else args.move_timeout),
+        margin=args.margin,
+        metrics=args.metrics)
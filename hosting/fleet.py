@@ -0,0 +1,270 @@
+#!/usr/bin/env python3 -u
+import json
+import os
+import socket
+import sys
+import threading
+import time
+import traceback
+
+
+MYDIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(MYDIR, '..', 'code'))
+
+import online
+
+
+RETRY_MIN=0.01
+
+RETRY_MAX=1.0
+
+
+class BotStats:
+    def __init__(self):
+        self.games = 0
+        self.errors = 0
+        self.fallbacks = 0
+        self.idle = 0
+        self.busy = 0
+        self.idle_since = None
+        self.last_error = None
+        self.playing = False
+
+    def idle_time(self):
+        # a bot that never gets into a game is idle the whole time
+        idle_since = self.idle_since
+        if self.playing or idle_since is None:
+            return self.idle
+        return self.idle + time.perf_counter() - idle_since
+
+    def summary(self):
+        return {
+            'games': self.games,
+            'errors': self.errors,
+            'fallbacks': self.fallbacks,
+            'idle_s': round(self.idle_time(), 3),
+            'busy_s': round(self.busy, 3),
+            'playing': self.playing,
+            'last_error': self.last_error,
+        }
+
+
+class Bot:
+    def __init__(self, name, host, port, cmd, logfile=None, move_timeout=online.MOVE_TIMEOUT,
+            margin=online.MOVE_MARGIN):
+        self.name = name
+        self.host = host
+        self.port = port
+        self.cmd = cmd
+        self.logfile = logfile
+        self.move_timeout = move_timeout
+        self.margin = margin
+        self.stats = BotStats()
+        self.stopped = threading.Event()
+        self.thread = None
+        self.server = None
+        self.offline = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, name=self.name, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+
+        # a bot still waiting for the game to fill up would wait forever
+        server, offline = self.server, self.offline
+        if server is not None and offline is not None and offline.fallback.punter is None:
+            transport = server.transport
+            if transport is not None:
+                try:
+                    transport.socket.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+
+    def _player(self):
+        offline = online.OfflinePlayer(self.cmd, logfile=self.logfile, warm=True,
+            move_timeout=self.move_timeout, margin=self.margin)
+        offline.prewarm()
+        return offline
+
+    def run(self):
+        offline = self.offline = self._player()
+        delay = RETRY_MIN
+        self.stats.idle_since = time.perf_counter()
+
+        while not self.stopped.is_set():
+            player = online.OnlinePlayer(offline, name=self.name, silent=True)
+            server = self.server = online.PunterServer(self.host, port=self.port, silent=True)
+
+            started = None
+            unexpected = False
+            try:
+                # connect here so stop() can interrupt the wait, play() reuses the connection
+                server._open_map(port=self.port)
+                if self.stopped.is_set():
+                    raise online.PunterError('stopped')
+                started = time.perf_counter()
+                self.stats.playing = True
+                server.play(player, transport=server.transport)
+            except (OSError, online.PunterError) as e:
+                error = '%s: %s' % (type(e).__name__, e)
+            except Exception as e:
+                # a malformed frame or a bug ends this game, not the bot
+                traceback.print_exc()
+                error = '%s: %s' % (type(e).__name__, e)
+                unexpected = True
+            else:
+                error = None
+            finally:
+                transport, server.transport = server.transport, None
+                if transport is not None:
+                    transport.close()
+
+            now = time.perf_counter()
+            in_game = offline.fallback.punter is not None
+            self.stats.playing = False
+
+            if in_game:
+                self.stats.idle += started - self.stats.idle_since
+                self.stats.busy += now - started
+                self.stats.fallbacks += offline.fallbacks
+                if error is None:
+                    self.stats.games += 1
+                else:
+                    self.stats.errors += 1
+                    self.stats.last_error = error
+                self.stats.idle_since = now
+                delay = RETRY_MIN
+
+                offline.close()
+                offline = self.offline = self._player()
+
+            else:
+                if unexpected:
+                    self.stats.errors += 1
+                    self.stats.last_error = error
+                    offline.close()
+                    offline = self.offline = self._player()
+
+                # server not open for a new game yet
+                self.stopped.wait(delay)
+                delay = min(RETRY_MAX, delay * 2)
+
+        self.server = None
+        offline.close()
+
+
+class Fleet:
+    def __init__(self, bots):
+        self.bots = bots
+        self.started = None
+
+    def start(self):
+        self.started = time.perf_counter()
+        for bot in self.bots:
+            bot.start()
+
+    def stop(self, timeout=None):
+        for bot in self.bots:
+            bot.stop()
+        for bot in self.bots:
+            bot.thread.join(timeout)
+
+    def summary(self):
+        return {
+            'uptime_s': round(time.perf_counter() - self.started, 3),
+            'bots': {bot.name: dict(port=bot.port, **bot.stats.summary()) for bot in self.bots},
+        }
+
+    def report(self):
+        lines = ['{:<24} {:>6} {:>7} {:>7} {:>10} {:>10} {:>10}'.format(
+            'bot', 'port', 'games', 'errors', 'fallbacks', 'idle s', 'busy s')]
+        for bot in self.bots:
+            x = bot.stats
+            lines.append('{:<24} {:>6} {:>7} {:>7} {:>10} {:>10.1f} {:>10.1f}'.format(
+                bot.name, bot.port, x.games, x.errors, x.fallbacks, x.idle_time(), x.busy))
+        return '\n'.join(lines)
+
+
+def parse_ports(text):
+    ports = list()
+    for part in text.split(','):
+        first, _, last = part.partition('-')
+        ports.extend(range(int(first), int(last or first) + 1))
+    return ports
+
+
+if __name__ == '__main__':
+    import argparse
+
+    default_host = os.environ.get('HOST', '127.0.0.1')
+
+    default_cmd = os.path.join(MYDIR, '..', 'code', 'punter')
+
+    parser = argparse.ArgumentParser(description='Bot fleet supervisor, replaces bot.sh')
+
+    parser.add_argument('-a', '--host', type=str,
+        default=default_host,
+        help='server host, $HOST or %s' % default_host)
+
+    parser.add_argument('-p', '--ports', type=str, default='9001',
+        help='server ports, e.g. 9001-9016')
+
+    parser.add_argument('-b', '--bots', type=int, default=1,
+        help='bots per port')
+
+    parser.add_argument('-n', '--name', type=str, default='bot',
+        help='bot name prefix')
+
+    parser.add_argument('--cmd', type=str, default=default_cmd,
+        help='offline client command line')
+
+    parser.add_argument('--log', type=str,
+        help='offline client log file')
+
+    parser.add_argument('-t', '--move-timeout', type=float, default=online.MOVE_TIMEOUT,
+        help='server move timeout in seconds, %s' % online.MOVE_TIMEOUT)
+
+    parser.add_argument('--margin', type=float, default=online.MOVE_MARGIN,
+        help='send a fallback move this many seconds before the move timeout, %s' % online.MOVE_MARGIN)
+
+    parser.add_argument('-i', '--interval', type=float, default=60,
+        help='seconds between stats reports')
+
+    parser.add_argument('--status', type=str,
+        help='write fleet stats as JSON to this file every interval')
+
+    parser.add_argument('-d', '--duration', type=float,
+        help='stop after this many seconds')
+
+    args = parser.parse_args()
+
+    cmd = args.cmd.split()
+    bots = [Bot('%s-%d-%d' % (args.name, port, i), args.host, port, cmd, logfile=args.log,
+            move_timeout=args.move_timeout, margin=args.margin)
+        for port in parse_ports(args.ports) for i in range(args.bots)]
+
+    fleet = Fleet(bots)
+    fleet.start()
+
+    deadline = None if args.duration is None else fleet.started + args.duration
+
+    try:
+        while deadline is None or time.perf_counter() < deadline:
+            wait = args.interval
+            if deadline is not None:
+                wait = min(wait, max(0, deadline - time.perf_counter()))
+            time.sleep(wait)
+
+            print(fleet.report())
+            if args.status:
+                with open(args.status, 'w') as fd:
+                    json.dump(fleet.summary(), fd, indent=2)
+
+        # let games in progress finish
+        fleet.stop()
+    except KeyboardInterrupt:
+        fleet.stop(timeout=1)
+
+    print(fleet.report())
@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+import itertools
+import json
+import math
+import multiprocessing
+import os
+import random
+import sys
+import time
+
+from glob import glob
+
+
+MYDIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(MYDIR, '..', 'code', 'lightning', 'src'))
+
+import engine
+
+
+def parse_player(spec):
+    name, _, cls = spec.rpartition('=')
+    return (name or cls, cls)
+
+
+def make_jobs(maps, players, seats, seeds, settings):
+    if seats <= len(players):
+        groups = list(itertools.combinations(players, seats))
+    else:
+        groups = [x for x in itertools.combinations_with_replacement(players, seats)
+            if len(set(x)) > 1 or len(players) == 1]
+
+    jobs = list()
+    for fn in maps:
+        for group in groups:
+            orders = list()
+            for i in range(seats):
+                order = group[i:] + group[:i]
+                if order not in orders:
+                    orders.append(order)
+            for order in orders:
+                for seed in seeds:
+                    jobs.append({
+                        'id': '{}|{}|{}|{}'.format(os.path.basename(fn), ','.join(x[0] for x in order), seed,
+                            ','.join(sorted(k for k, v in settings.items() if v))),
+                        'map': fn,
+                        'players': [list(x) for x in order],
+                        'seed': seed,
+                        'settings': settings,
+                    })
+    return jobs
+
+
+def ranks(scores):
+    res = [0] * len(scores)
+    order = sorted(range(len(scores)), key=lambda i: -scores[i])
+    i = 0
+    while i < len(order):
+        j = i
+        while j + 1 < len(order) and scores[order[j + 1]] == scores[order[i]]:
+            j += 1
+        for k in range(i, j + 1):
+            res[order[k]] = (i + j) / 2 + 1
+        i = j + 1
+    return res
+
+
+def run_job(job):
+    random.seed(job['seed'])
+
+    with open(job['map'], 'r') as fd:
+        game_map = json.load(fd)
+
+    names = [name for name, _ in job['players']]
+    players = [engine.load_player(cls) for _, cls in job['players']]
+    settings = job['settings']
+
+    game = engine.Game(game_map, players, names=names,
+        futures=settings.get('futures', False),
+        options=settings.get('options', False),
+        splurges=settings.get('splurges', False))
+
+    t = time.perf_counter()
+    scores = [x['score'] for x in game.run()]
+    elapsed = time.perf_counter() - t
+
+    return {
+        'id': job['id'],
+        'map': os.path.basename(job['map']),
+        'seed': job['seed'],
+        'players': names,
+        'scores': scores,
+        'ranks': ranks(scores),
+        'elapsed': round(elapsed, 3),
+        'player_elapsed': [round(x, 3) for x in game.elapsed],
+        'errors': game.errors,
+    }
+
+
+def load_results(fn):
+    results = list()
+    if fn is None or not os.path.exists(fn):
+        return results
+
+    with open(fn, 'r') as fd:
+        for line in fd:
+            try:
+                results.append(json.loads(line))
+            except ValueError:
+                continue
+    return results
+
+
+class Stats:
+    def __init__(self):
+        self.values = list()
+
+    def add(self, x):
+        self.values.append(x)
+
+    @property
+    def count(self):
+        return len(self.values)
+
+    @property
+    def mean(self):
+        return sum(self.values) / len(self.values) if self.values else 0
+
+    def ci(self, z=1.96):
+        n = len(self.values)
+        if n < 2:
+            return 0
+        mean = self.mean
+        sd = math.sqrt(sum((x - mean) ** 2 for x in self.values) / (n - 1))
+        return z * sd / math.sqrt(n)
+
+
+def summary(results):
+    per_map = dict()
+    overall = dict()
+
+    for x in results:
+        for name, score, rank in zip(x['players'], x['scores'], x['ranks']):
+            per_map.setdefault((x['map'], name), Stats()).add(score)
+            stats = overall.setdefault(name, {'rank': Stats(), 'wins': Stats(), 'errors': 0})
+            stats['rank'].add(rank)
+            stats['wins'].add(1 if rank == 1 else 0)
+        for name, errors in zip(x['players'], x.get('errors', list())):
+            overall[name]['errors'] += errors
+
+    lines = list()
+    lines.append('{:<28} {:<16} {:>6} {:>12} {:>10}'.format('map', 'player', 'games', 'mean score', '95% ci'))
+    for (map_name, name), stats in sorted(per_map.items()):
+        lines.append('{:<28} {:<16} {:>6} {:>12.1f} {:>10.1f}'.format(
+            map_name, name, stats.count, stats.mean, stats.ci()))
+
+    lines.append('')
+    lines.append('{:<16} {:>6} {:>10} {:>8} {:>9} {:>8} {:>7}'.format(
+        'player', 'games', 'mean rank', '95% ci', 'win rate', '95% ci', 'errors'))
+    for name, stats in sorted(overall.items(), key=lambda x: x[1]['rank'].mean):
+        lines.append('{:<16} {:>6} {:>10.3f} {:>8.3f} {:>9.3f} {:>8.3f} {:>7}'.format(
+            name, stats['rank'].count, stats['rank'].mean, stats['rank'].ci(),
+            stats['wins'].mean, stats['wins'].ci(), stats['errors']))
+
+    return '\n'.join(lines)
+
+
+def run(jobs, results_file, workers, silent=False):
+    done = set(x['id'] for x in load_results(results_file))
+    pending = [job for job in jobs if job['id'] not in done]
+
+    if not silent:
+        print(': {} jobs, {} done, {} to run on {} workers'.format(
+            len(jobs), len(jobs) - len(pending), len(pending), workers), file=sys.stderr)
+
+    out = open(results_file, 'a+', 1) if results_file else sys.stdout
+    if out is not sys.stdout and out.tell() > 0:
+        out.seek(out.tell() - 1)
+        if out.read(1) != '\n':
+            out.write('\n')
+
+    try:
+        with multiprocessing.Pool(workers) as pool:
+            for n, result in enumerate(pool.imap_unordered(run_job, pending)):
+                out.write(json.dumps(result) + '\n')
+                if not silent:
+                    print(': [{}/{}] {} {}'.format(n + 1, len(pending), result['id'], result['scores']),
+                        file=sys.stderr)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+
+if __name__ == '__main__':
+    import argparse
+
+    default_maps = os.path.join(MYDIR, '..', 'server', 'maps')
+
+    parser = argparse.ArgumentParser(description='Tournament runner over maps, seat orders and seeds')
+
+    parser.add_argument('maps', nargs='*',
+        help='map files, all of server/maps by default')
+
+    parser.add_argument('-p', '--player', action='append', metavar='[NAME=]MODULE:CLASS',
+        help='player variant, e.g. search=search:SearchPlayer; repeat for each variant')
+
+    parser.add_argument('-n', '--seats', type=int, default=2,
+        help='players per game')
+
+    parser.add_argument('-s', '--seeds', type=int, default=5,
+        help='seeds per (map, seat order)')
+
+    parser.add_argument('-w', '--workers', type=int, default=os.cpu_count(),
+        help='worker processes')
+
+    parser.add_argument('-o', '--results', type=str,
+        help='JSONL results file, appended to and resumed from')
+
+    parser.add_argument('--summary', action='store_true',
+        help='summarize the results file without running games')
+
+    parser.add_argument('--futures', action='store_true',
+        help='enable futures')
+
+    parser.add_argument('--options', action='store_true',
+        help='enable options')
+
+    parser.add_argument('--splurges', action='store_true',
+        help='enable splurges')
+
+    parser.add_argument('-q', '--quiet', action='store_true',
+        help='no progress output')
+
+    args = parser.parse_args()
+
+    if not args.summary:
+        maps = args.maps or sorted(x for x in glob(os.path.join(default_maps, '*.json'))
+            if os.path.basename(x) != 'maps.json')
+
+        players = [parse_player(x) for x in (args.player or ['player:RandomMinesPlayer', 'player:RandomPlayer'])]
+        settings = {'futures': args.futures, 'options': args.options, 'splurges': args.splurges}
+
+        jobs = make_jobs(maps, players, args.seats, list(range(args.seeds)), settings)
+        run(jobs, args.results, args.workers, silent=args.quiet)
+
+    if args.results:
+        print(summary(load_results(args.results)))
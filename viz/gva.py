@@ -9,6 +9,7 @@ from glob import glob
 from graphviz import dot
 from imagemagick import ImageMagick
 from operator import itemgetter
+from raster import Rasterizer
 
 
 class LogFormat:
@@ -74,11 +75,16 @@ class GameBoard:
         self.player_id = player_id
         self.players = players
         self.claims = set()
+        self.changed = list()
 
         mines = mapobj['mines']
         sites = mapobj['sites']
         rivers = mapobj['rivers']
 
+        self.positions = {site['id']: (site['x'], site['y']) for site in sites}
+        self.mines = set(mines)
+        self.rivers = [self._enorm(river['source'], river['target']) for river in rivers]
+
         sites = [(site['id'], site['x'], -site['y']) for site in sites]
 
         minx = min(x for _,x,y in sites)
@@ -119,6 +125,7 @@ class GameBoard:
     def claim(self, player_id, river):
         river = self._enorm(river)
         self.claims.add(river)
+        self.changed.append(river)
 
         attrs = self.claimed_edge_attrs.copy()
         attrs['color'] = self._player_color(player_id)
@@ -136,6 +143,7 @@ class GameBoard:
         attrs['color'] = '{}:{}'.format(claim_color, option_color)
 
         self.graph.update_edge(river, **attrs)
+        self.changed.append(river)
 
     def splurge(self, player_id, route):
         for river in zip(route, route[1:]):
@@ -153,7 +161,8 @@ class GameBoard:
 
 class LogAnimator:
 
-    def __init__(self, fps=1.0, loop=False, save_frames=None, max_frames=None, log_format=None, silent=False):
+    def __init__(self, fps=1.0, loop=False, save_frames=None, max_frames=None, log_format=None, silent=False,
+            backend=None):
         self.fps = fps
         self.loop = loop
         self.save_frames = save_frames
@@ -161,6 +170,7 @@ class LogAnimator:
         self.log_format = log_format or LogFormat.AUTO
         self.silent = silent
         self.frame_count = 0
+        self.rasterizer = Rasterizer() if backend == 'raster' else None
 
     def process(self, logfile, target):
 
@@ -297,8 +307,11 @@ class LogAnimator:
             sys.stderr.write('.')
             sys.stderr.flush()
 
-        plotter = dot.Plotter()
-        plotter.plot(board.graph, fn, format='png')
+        if self.rasterizer is not None:
+            self.rasterizer.plot(board, fn)
+        else:
+            plotter = dot.Plotter()
+            plotter.plot(board.graph, fn, format='png')
 
     def _animate(self, from_dir, target):
         if not self.silent:
@@ -348,6 +361,9 @@ if __name__ == '__main__':
     parser.add_argument('--server', action='store_true',
         help='server log format')
 
+    parser.add_argument('-b', '--backend', choices=('dot', 'raster'), default='dot',
+        help='frame renderer: dot (graphviz neato per frame) or raster (Pillow, incremental)')
+
     parser.add_argument('-s', '--silent', action='store_true',
         help='be quiet')
 
@@ -366,4 +382,5 @@ if __name__ == '__main__':
         max_frames=args.max_frames,
         log_format=log_format,
         silent=args.silent,
+        backend=args.backend,
         )
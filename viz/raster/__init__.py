@@ -0,0 +1 @@
+from .canvas import Rasterizer
@@ -0,0 +1,151 @@
+import math
+
+from functools import lru_cache
+
+try:
+    from PIL import Image, ImageColor, ImageDraw
+except ImportError:
+    Image = None
+
+
+# Graphviz (X11) colors used by GameBoard, Pillow only knows the CSS names
+
+X11_COLORS = {
+    'brown1': '#ff4040',
+    'coral4': '#8b3e2f',
+    'darkorchid2': '#b23aee',
+    'dodgerblue3': '#1874cd',
+    'firebrick1': '#ff3030',
+    'goldenrod1': '#ffc125',
+    'orange2': '#ee9a00',
+    'purple1': '#9b30ff',
+    'yellow3': '#cdcd00',
+}
+
+
+@lru_cache(maxsize=None)
+def color(name):
+    name = name.lower()
+    if name in X11_COLORS:
+        return ImageColor.getrgb(X11_COLORS[name])
+
+    for prefix in ('gray', 'grey'):
+        level = name[len(prefix):]
+        if name.startswith(prefix) and level.isdigit():
+            x = int(round(int(level) * 255 / 100))
+            return (x, x, x)
+
+    return ImageColor.getrgb(name)
+
+
+class Rasterizer:
+    def __init__(self, size=800, margin=12, site_radius=1, mine_radius=4, edge_width=3, dot_step=4):
+        if Image is None:
+            raise RuntimeError('raster backend needs Pillow, pip install Pillow')
+
+        self.size = size
+        self.margin = margin
+        self.site_radius = site_radius
+        self.mine_radius = mine_radius
+        self.edge_width = edge_width
+        self.dot_step = dot_step
+
+        self.board = None
+        self.base = None
+        self.canvas = None
+        self.draw = None
+        self.points = None
+        self.painted = 0
+        self.site_color = None
+        self.mine_color = None
+
+    def plot(self, board, target, format='png'):
+        if board is not self.board:
+            if self.board is not None and self._same_map(self.board, board):
+                self._reset(board)
+            else:
+                self._setup(board)
+
+        changed = board.changed
+        for river in changed[self.painted:]:
+            self._paint_river(river)
+        self.painted = len(changed)
+
+        self.canvas.save(target, format=format, compress_level=1)
+
+    def _setup(self, board):
+        positions = board.positions
+
+        minx = min(x for x, y in positions.values())
+        maxx = max(x for x, y in positions.values())
+        miny = min(y for x, y in positions.values())
+        maxy = max(y for x, y in positions.values())
+
+        scale = (self.size - 2 * self.margin) / (max(maxx - minx, maxy - miny) or 1)
+
+        self.points = {site: (int(round((x - minx) * scale)) + self.margin, int(round((y - miny) * scale)) + self.margin)
+            for site, (x, y) in positions.items()}
+
+        width = int(round((maxx - minx) * scale)) + 2 * self.margin + 1
+        height = int(round((maxy - miny) * scale)) + 2 * self.margin + 1
+
+        # a handful of colors, palette frames encode several times faster than RGB
+        base = Image.new('P', (width, height), 'white')
+        draw = ImageDraw.Draw(base)
+
+        edge_color = color(board.graph.edge_attr['color'])
+        for source, target in board.rivers:
+            self._dotted(draw, self.points[source], self.points[target], edge_color)
+
+        self.site_color = color(board.site_attrs['color'])
+        self.mine_color = color(board.mine_attrs['fillcolor'])
+        for site in self.points:
+            self._paint_site(draw, site, board.mines)
+
+        self.base = base
+        self._reset(board)
+
+    def _same_map(self, a, b):
+        return a.positions == b.positions and a.rivers == b.rivers and a.mines == b.mines
+
+    def _reset(self, board):
+        self.board = board
+        self.canvas = self.base.copy()
+        self.draw = ImageDraw.Draw(self.canvas)
+        self.painted = 0
+
+    def _dotted(self, draw, a, b, fill):
+        (x0, y0), (x1, y1) = a, b
+        n = max(1, int(math.hypot(x1 - x0, y1 - y0) / self.dot_step))
+        draw.point([(x0 + (x1 - x0) * i / n, y0 + (y1 - y0) * i / n) for i in range(n + 1)], fill=fill)
+
+    def _paint_site(self, draw, site, mines):
+        x, y = self.points[site]
+        if site in mines:
+            r = self.mine_radius
+            draw.ellipse((x - r, y - r, x + r, y + r), fill=self.mine_color)
+        else:
+            r = self.site_radius
+            draw.ellipse((x - r, y - r, x + r, y + r), fill=self.site_color)
+
+    def _paint_river(self, river):
+        source, target = river
+        a = self.points[source]
+        b = self.points[target]
+
+        colors = [color(x) for x in self.board.graph.get_edge_attrs(river)['color'].split(':')]
+
+        if len(colors) == 1:
+            self.draw.line((a, b), fill=colors[0], width=self.edge_width)
+        else:
+            # claim and option side by side, as graphviz draws parallel colors
+            (x0, y0), (x1, y1) = a, b
+            d = math.hypot(x1 - x0, y1 - y0) or 1
+            nx, ny = (y0 - y1) / d, (x1 - x0) / d
+            width = max(1, self.edge_width - 1)
+            for i, fill in enumerate(colors):
+                k = (i - (len(colors) - 1) / 2) * width
+                self.draw.line(((x0 + nx * k, y0 + ny * k), (x1 + nx * k, y1 + ny * k)), fill=fill, width=width)
+
+        self._paint_site(self.draw, source, self.board.mines)
+        self._paint_site(self.draw, target, self.board.mines)